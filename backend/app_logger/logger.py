@@ -5,12 +5,17 @@ import uuid
 from bson import ObjectId
 from datetime import datetime
 from contextvars import ContextVar
-from auth.mongo import db
+from app_logger.mongo_sink import log_sink
 import os
 
 # Ensure logs directory exists
 os.makedirs("/app/logs", exist_ok=True)
 
+# "dev"  : pretty box-drawing console output per event + request summary
+# "prod" : one compact JSON line per event, no console banners
+LOG_MODE = os.getenv("LOG_MODE", "dev")
+DEV_LOGS = LOG_MODE == "dev"
+
 
 # =====================================================
 # LOG FILE CONFIG (Docker + File)
@@ -73,12 +78,55 @@ def _serialize(obj):
     return obj
 
 
-def _sanitize(data):
-    if isinstance(data, dict):
-        return {k: _sanitize(v) for k, v in data.items()}
-    if isinstance(data, list):
-        return [_sanitize(i) for i in data]
-    return _serialize(data)
+def _sanitize(data: dict) -> dict:
+    """
+    Single pass over an event: ObjectId / datetime become strings, plain
+    values are taken as-is. Only nested containers (rare in events) are
+    walked, so flat events cost one shallow dict build.
+    """
+    out = {}
+    for k, v in data.items():
+        if isinstance(v, (str, int, float, bool)) or v is None:
+            out[k] = v
+        elif isinstance(v, dict):
+            out[k] = _sanitize(v)
+        elif isinstance(v, list):
+            out[k] = [_sanitize(i) if isinstance(i, dict) else _serialize(i) for i in v]
+        else:
+            out[k] = _serialize(v)
+    return out
+
+
+def _json_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return str(obj)
+
+
+# Compact encoder reused for every event (no per-call setup)
+_encode = json.JSONEncoder(
+    default=_json_default,
+    separators=(",", ":"),
+    check_circular=False
+).encode
+
+def _emit_line(line: str):
+    """
+    Write one pre-encoded JSON line to every handler's stream.
+
+    Handlers only use "%(message)s", so building a LogRecord (caller lookup,
+    formatting) per event is pure overhead; write under the handler lock
+    instead.
+    """
+    for handler in logger.handlers:
+        handler.acquire()
+        try:
+            handler.stream.write(line + handler.terminator)
+            handler.flush()
+        finally:
+            handler.release()
 
 # =====================================================
 # REQUEST LIFECYCLE
@@ -86,7 +134,8 @@ def _sanitize(data):
 def start_request():
     rid = str(uuid.uuid4())
     request_id_ctx.set(rid)
-    request_logs_ctx.set([])
+    # Per-request aggregation only feeds the dev console summary
+    request_logs_ctx.set([] if DEV_LOGS else None)
     return rid
 
 
@@ -194,19 +243,26 @@ def log_event(collection: str, data: dict):
         "timestamp": ts
     }
 
-    # 1️⃣ MongoDB (stored under App.log collection)
-    try:
-        db["App.log"].insert_one(log_entry)
-    except Exception as e:
-        print(f"❌ Mongo log error: {e}")
+    # 1️⃣ JSON line (file + console handlers)
+    _emit_line(_encode(log_entry))
 
-    # 2️⃣ Per-request aggregation
+    # 2️⃣ MongoDB (app_events time-series collection, batched in background)
+    log_sink.submit({
+        "timestamp": datetime.utcfromtimestamp(ts),
+        "meta": {"collection": collection, "event": safe_data.get("event")},
+        "data": safe_data
+    })
+
+    if not DEV_LOGS:
+        return
+
+    # 3️⃣ Per-request aggregation
     logs = request_logs_ctx.get()
     if logs is not None:
         logs.append({**safe_data, "timestamp": ts})
         request_logs_ctx.set(logs)
 
-    # 3️⃣ Pretty Docker console output
+    # 4️⃣ Pretty Docker console output
     print("\n" + "═" * 80)
     print(f"🧾 LOG EVENT → {collection}")
     print("═" * 80)
@@ -214,6 +270,3 @@ def log_event(collection: str, data: dict):
         print(f"{k:<18}: {v}")
     print("═" * 80)
 
-    # 4️⃣ JSON file logging
-    logger.info(json.dumps(log_entry, default=str))
-
@@ -0,0 +1,184 @@
+import asyncio
+import atexit
+import os
+import queue
+import threading
+import time
+
+from auth.mongo import ensure_collection, events_collection
+
+# =====================================================
+# BATCHED MONGO SINK (app_events)
+# =====================================================
+# log_event used to do one blocking insert_one per event on the request path.
+# Events are now put on a bounded in-process queue and a background thread
+# writes them with insert_many, flushing when a batch is full or when the
+# flush interval elapses, whichever comes first.
+#
+# The target is the app_events time-series collection (see auth/mongo.py),
+# which has to exist before the first insert: `prepare` creates it.
+
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "200"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+# "drop": never wait, count the event as dropped when the queue is full
+# "block": wait up to LOG_BLOCK_TIMEOUT for room, then drop. Only off the
+# event loop (threadpool handlers, scripts); on the loop thread waiting
+# would stall every request, so there it behaves like "drop"
+LOG_QUEUE_POLICY = os.getenv("LOG_QUEUE_POLICY", "drop")
+LOG_BLOCK_TIMEOUT = float(os.getenv("LOG_BLOCK_TIMEOUT", "0.5"))
+
+_WAKE = object()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class MongoLogSink:
+    def __init__(
+        self,
+        collection,
+        maxsize=LOG_QUEUE_SIZE,
+        batch_size=LOG_BATCH_SIZE,
+        flush_interval=LOG_FLUSH_INTERVAL,
+        policy=LOG_QUEUE_POLICY,
+        block_timeout=LOG_BLOCK_TIMEOUT,
+        prepare=None
+    ):
+        self.collection = collection
+        self.prepare = prepare
+        self._prepared = prepare is None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        self.submitted = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    # -------------------------
+    # PRODUCER SIDE
+    # -------------------------
+    def submit(self, entry: dict) -> bool:
+        if self._thread is None:
+            self.start()
+
+        try:
+            if self.policy == "block" and not _on_event_loop():
+                self._queue.put(entry, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    # -------------------------
+    # LIFECYCLE
+    # -------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name="app-log-sink",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything still queued and stop the writer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        self._thread = None
+
+    # -------------------------
+    # WRITER THREAD
+    # -------------------------
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+            if self._stopping.is_set() and self._queue.empty():
+                return
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # While stopping, drain without waiting for the interval
+            remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _WAKE:
+                continue
+            batch.append(item)
+        return batch
+
+    def _flush(self, batch):
+        try:
+            if not self._prepared:
+                self.prepare()
+                self._prepared = True
+            self.collection.insert_many(batch, ordered=False)
+            with self._lock:
+                self.flushed += len(batch)
+                self.batches += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            print(f"❌ Mongo log error: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+                "policy": self.policy,
+                "submitted": self.submitted,
+                "flushed": self.flushed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "batches": self.batches
+            }
+
+
+log_sink = MongoLogSink(
+    events_collection,
+    prepare=lambda: ensure_collection(events_collection.name)
+)
+
+# Flush on interpreter exit as well as on app shutdown
+atexit.register(log_sink.stop)
@@ -1,11 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from time import time
+from datetime import datetime, timedelta, timezone
+import re
 from bson import ObjectId
 
-from auth.mongo import users_collection, api_keys_collection, usage_collection, db
+from auth.mongo import (
+    users_collection,
+    api_keys_collection,
+    async_users_collection,
+    purge_jobs_collection,
+    run_in_db
+)
 from auth.admin_required import admin_required
-from auth.auth_utils import redis_client
+from auth.auth_utils import (
+    SESSIONS_LAST_SEEN_KEY,
+    _session_key,
+    destroy_user_sessions,
+    prune_session_index,
+    redis_client
+)
+from auth.principal_cache import principal_cache, invalidate_user
 from app_logger.logger import log_event
+from gateway.http_clients import pool_stats
+from gateway.result_cache import cache_stats
+from gateway.jobs import queue_depth
+from gateway.limiter import limiter_stats
+from gateway.backend_pool import backend_node_stats
+from gateway.ws_pool import ws_pool_stats
+from gateway.http_cache import response_cache
+from gateway.usage import GRANULARITIES, usage_series
+from gateway.purge import submit_purge, get_purge_job, job_view
+from app_logger.mongo_sink import log_sink
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -13,38 +38,92 @@ router = APIRouter(prefix="/admin", tags=["Admin"])
 # 👥 USERS
 # =====================================================
 
+USER_SORT_FIELDS = ["username", "email", "created_at", "upload_limit"]
+
+
+def _user_filter(search: str = None) -> dict:
+    # Anchored, case-sensitive regexes so each branch can use its index
+    if not search:
+        return {}
+    prefix = {"$regex": "^" + re.escape(search)}
+    return {"$or": [{"username": prefix}, {"email": prefix}]}
+
+
+def user_list_pipeline(match: dict, sort: str, order: int, skip: int, limit: int) -> list:
+    """
+    One page of users joined with their API key status. The join runs after
+    the page is cut, so it costs one indexed api_keys lookup per listed user.
+    """
+    return [
+        {"$match": match},
+        {"$sort": {sort: order, "_id": order}},
+        {"$skip": skip},
+        {"$limit": limit},
+        # api_keys.user_id holds the user id as a string
+        {"$addFields": {"uid": {"$toString": "$_id"}}},
+        {"$lookup": {
+            "from": api_keys_collection.name,
+            "localField": "uid",
+            "foreignField": "user_id",
+            "as": "api_key"
+        }},
+        {"$project": {
+            "_id": 0,
+            "id": "$uid",
+            "username": 1,
+            "email": 1,
+            "upload_limit": {"$ifNull": ["$upload_limit", 0]},
+            "is_admin": {"$ifNull": ["$is_admin", False]},
+            "api_key_active": {
+                "$ifNull": [{"$arrayElemAt": ["$api_key.active", 0]}, False]
+            }
+        }}
+    ]
+
+
 @router.get("/users")
-def list_users(admin=Depends(admin_required)):
+def list_users(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500),
+    sort: str = Query("username", enum=USER_SORT_FIELDS),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    search: str = Query(None, max_length=100),
+    admin=Depends(admin_required)
+):
     log_event("logs_auth", {
         "event": "admin_users_list_accessed",
         "admin_user_id": admin["_id"],
         "admin_username": admin["username"],
         "timestamp": int(time())
     })
-    
-    users = []
-    for u in users_collection.find({}, {"password": 0}):
-        # Get API key status for this user
-        api_key_doc = api_keys_collection.find_one({"user_id": str(u["_id"])})
-        api_key_active = api_key_doc.get("active") if api_key_doc else False
-        
-        users.append({
-            "id": str(u["_id"]),
-            "username": u["username"],
-            "email": u["email"],
-            "upload_limit": u.get("upload_limit", 0),
-            "is_admin": u.get("is_admin", False),
-            "api_key_active": api_key_active
-        })
-        
+
+    if sort not in USER_SORT_FIELDS or order not in ("asc", "desc"):
+        raise HTTPException(400, "Invalid sort")
+
+    match = _user_filter(search)
+    users = list(users_collection.aggregate(user_list_pipeline(
+        match,
+        sort,
+        1 if order == "asc" else -1,
+        (page - 1) * page_size,
+        page_size
+    )))
+    total = users_collection.count_documents(match)
+
     log_event("logs_auth", {
         "event": "admin_users_list_returned",
         "admin_user_id": admin["_id"],
         "users_count": len(users),
+        "total": total,
         "timestamp": int(time())
     })
-    
-    return users
+
+    return {
+        "items": users,
+        "total": total,
+        "page": page,
+        "page_size": page_size
+    }
 
 
 @router.put("/users/{user_id}/upload-limit")
@@ -77,6 +156,8 @@ def update_upload_limit(
         })
         raise HTTPException(404, "User not found")
 
+    invalidate_user(user_id)
+
     log_event("logs_auth", {
         "event": "admin_upload_limit_updated",
         "admin_user_id": admin["_id"],
@@ -89,6 +170,55 @@ def update_upload_limit(
     return {"message": "Upload limit updated"}
 
 
+@router.put("/users/{user_id}/max-duration")
+def update_max_duration(
+    user_id: str,
+    seconds: float = None,
+    admin=Depends(admin_required)
+):
+    """Per-user longest upload in seconds; 0 = no limit, omitted = the global default."""
+    log_event("logs_auth", {
+        "event": "admin_max_duration_update_requested",
+        "admin_user_id": admin["_id"],
+        "admin_username": admin["username"],
+        "target_user_id": user_id,
+        "new_max_duration": seconds,
+        "timestamp": int(time())
+    })
+
+    if seconds is None:
+        update = {"$unset": {"max_audio_duration_sec": ""}}
+    elif seconds < 0:
+        raise HTTPException(400, "Duration must not be negative")
+    else:
+        update = {"$set": {"max_audio_duration_sec": seconds}}
+
+    res = users_collection.update_one({"_id": ObjectId(user_id)}, update)
+    if res.matched_count == 0:
+        log_event("logs_auth", {
+            "event": "admin_max_duration_update_failed",
+            "admin_user_id": admin["_id"],
+            "admin_username": admin["username"],
+            "target_user_id": user_id,
+            "reason": "user_not_found",
+            "timestamp": int(time())
+        })
+        raise HTTPException(404, "User not found")
+
+    invalidate_user(user_id)
+
+    log_event("logs_auth", {
+        "event": "admin_max_duration_updated",
+        "admin_user_id": admin["_id"],
+        "admin_username": admin["username"],
+        "target_user_id": user_id,
+        "new_max_duration": seconds,
+        "timestamp": int(time())
+    })
+
+    return {"message": "Max audio duration updated"}
+
+
 # =====================================================
 # 🔑 API KEYS
 # =====================================================
@@ -123,6 +253,8 @@ def activate_api_key(user_id: str, admin=Depends(admin_required)):
         })
         raise HTTPException(404, "API key not found")
 
+    invalidate_user(user_id)
+
     log_event("logs_auth", {
         "event": "admin_api_key_activated",
         "admin_user_id": admin["_id"],
@@ -160,6 +292,8 @@ def deactivate_api_key(user_id: str, admin=Depends(admin_required)):
         })
         raise HTTPException(404, "API key not found")
 
+    invalidate_user(user_id)
+
     log_event("logs_auth", {
         "event": "admin_api_key_deactivated",
         "admin_user_id": admin["_id"],
@@ -175,16 +309,51 @@ def deactivate_api_key(user_id: str, admin=Depends(admin_required)):
 # 📊 USAGE ANALYTICS (Mongo)
 # =====================================================
 
+USAGE_MAX_POINTS = 2000
+# Upper bound for date_from / date_to, so date arithmetic stays in range
+MAX_TIMESTAMP = 4102444800  # 2100-01-01
+
+
+def _utc(ts: int) -> datetime:
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+
+
 @router.get("/usage")
-def usage_analytics(admin=Depends(admin_required)):
-    data = []
-    for u in usage_collection.find():
-        data.append({
-            "user_id": u["user_id"],
-            "files_uploaded": u.get("files_uploaded", 0),
-            "seconds_processed": u.get("seconds_processed", 0)
-        })
-    return data
+async def usage_analytics(
+    granularity: str = Query("hour", enum=list(GRANULARITIES)),
+    date_from: int = Query(None, ge=0, le=MAX_TIMESTAMP, description="Unix timestamp, inclusive"),
+    date_to: int = Query(None, ge=0, le=MAX_TIMESTAMP, description="Unix timestamp, exclusive"),
+    user_id: str = Query(None),
+    mode: str = Query(None, enum=["transcribe", "diarize"]),
+    admin=Depends(admin_required)
+):
+    """
+    Usage time series from the hourly / daily rollups. Defaults to the last
+    24 hours (hour) or 30 days (day); all users unless user_id is given.
+    """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(400, "Invalid granularity")
+
+    end = _utc(date_to) if date_to is not None else datetime.utcnow()
+    if date_from is not None:
+        start = _utc(date_from)
+    else:
+        start = end - (timedelta(hours=24) if granularity == "hour" else timedelta(days=30))
+    if start >= end:
+        raise HTTPException(400, "date_from must be before date_to")
+    if (end - start) / GRANULARITIES[granularity] > USAGE_MAX_POINTS:
+        raise HTTPException(400, f"Range too large for {granularity} granularity")
+
+    series = await usage_series(granularity, start, end, user_id=user_id, mode=mode)
+
+    return {
+        "granularity": granularity,
+        "date_from": int(start.replace(tzinfo=timezone.utc).timestamp()),
+        "date_to": int(end.replace(tzinfo=timezone.utc).timestamp()),
+        "user_id": user_id,
+        "mode": mode,
+        "series": series
+    }
 
 
 # =====================================================
@@ -192,71 +361,126 @@ def usage_analytics(admin=Depends(admin_required)):
 # =====================================================
 
 @router.get("/rate-limits")
-def rate_limits(admin=Depends(admin_required)):
-    stats = []
+def rate_limits(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    admin=Depends(admin_required)
+):
+    """Live sessions, most recently seen first, from the session index."""
+    prune_session_index()
 
-    for key in redis_client.scan_iter("session:*"):
-        data = redis_client.hgetall(key)
+    entries = redis_client.zrevrange(
+        SESSIONS_LAST_SEEN_KEY, offset, offset + limit - 1, withscores=True
+    )
+    pipe = redis_client.pipeline(transaction=False)
+    for session_id, _ in entries:
+        pipe.hgetall(_session_key(session_id))
+    pipe.zcard(SESSIONS_LAST_SEEN_KEY)
+    *sessions, total = pipe.execute()
+
+    stats = []
+    for (session_id, last_seen), data in zip(entries, sessions):
         if not data:
-            continue
+            continue  # expired since it was last seen; pruned on a later call
 
         stats.append({
-            "session": key,
+            "session": _session_key(session_id),
             "user_id": data.get("user_id"),
             "files_uploaded": data.get("files_uploaded", 0),
             "seconds_processed": data.get("seconds_processed", 0),
-            "last_seen": data.get("last_seen")
+            "last_seen": data.get("last_seen", int(last_seen))
         })
 
-    return stats
+    return {
+        "items": stats,
+        "total": total,
+        "offset": offset,
+        "limit": limit
+    }
 
-@router.delete("/users/{user_id}")
-def delete_user(
-    user_id: str,
-    admin=Depends(admin_required)
-):
-    from bson import ObjectId
 
-    # 1️⃣ Ensure user exists
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(404, "User not found")
+@router.post("/users/{user_id}/logout-all")
+def logout_all_sessions(user_id: str, admin=Depends(admin_required)):
+    ended = destroy_user_sessions(user_id)
 
-    # 2️⃣ Delete API keys
-    api_keys_collection.delete_many({
-        "user_id": user_id
+    log_event("logs_auth", {
+        "event": "admin_user_sessions_revoked",
+        "admin_user_id": admin["_id"],
+        "admin_username": admin["username"],
+        "target_user_id": user_id,
+        "sessions_ended": ended,
+        "timestamp": int(time())
     })
 
-    # 3️⃣ Delete usage stats
-    usage_collection.delete_many({
-        "user_id": user_id
-    })
+    return {"message": "Sessions ended", "sessions_ended": ended}
 
-    # 4️⃣ Delete logs (OPTIONAL but recommended)
-    # db.logs_api.delete_many({"data.user_id": user_id})
-    # db.logs_auth.delete_many({"data.user_id": user_id})
-    db.logs_usage.delete_many({"data.user_id": user_id})
+# =====================================================
+# 📈 GATEWAY METRICS
+# =====================================================
 
-    # 5️⃣ Delete Redis keys
-    redis_client.delete(f"upload_limit:{user_id}")
-    redis_client.delete(f"stats:{user_id}")
+@router.get("/metrics")
+async def gateway_metrics(admin=Depends(admin_required)):
+    return {
+        "upload_jobs": await queue_depth(),
+        "backend_limiters": limiter_stats(),
+        "backend_http_pools": pool_stats(),
+        "backend_nodes": backend_node_stats(),
+        "backend_ws_pools": ws_pool_stats(),
+        "response_cache": response_cache.stats(),
+        "log_sink": log_sink.stats(),
+        "principal_cache": principal_cache.stats(),
+        "result_cache": cache_stats()
+    }
 
-    # 6️⃣ Delete user itself
-    users_collection.delete_one({
-        "_id": ObjectId(user_id)
-    })
+@router.delete("/users/{user_id}", status_code=202)
+async def delete_user(
+    user_id: str,
+    admin=Depends(admin_required)
+):
+    """
+    Start a background purge of the user and all their data; poll the
+    returned status_url for progress. Re-sending it resumes a failed purge.
+    """
+    try:
+        oid = ObjectId(user_id)
+    except Exception:
+        raise HTTPException(400, "Invalid user id")
+
+    user = await async_users_collection.find_one({"_id": oid}, {"username": 1})
+    if not user:
+        # The user document goes early in a purge; allow retrying one that failed
+        previous = await run_in_db(
+            purge_jobs_collection.find_one,
+            {"user_id": user_id, "status": {"$ne": "done"}},
+            sort=[("created_at", -1)]
+        )
+        if not previous:
+            raise HTTPException(404, "User not found")
+        user = {"_id": oid, "username": previous.get("username")}
+
+    job = await submit_purge(user, admin)
 
-    # 7️⃣ Audit log
     log_event("logs_auth", {
-        "event": "admin_user_deleted",
+        "event": "admin_user_delete_requested",
         "admin_user_id": admin["_id"],
         "admin_username": admin["username"],
         "deleted_user_id": user_id,
-        "deleted_username": user["username"],
+        "deleted_username": user.get("username"),
+        "purge_job_id": str(job["_id"]),
         "timestamp": int(time())
     })
 
     return {
-        "message": "User deleted successfully",
-        "user_id": user_id
+        "message": "User deletion started",
+        "user_id": user_id,
+        "job_id": str(job["_id"]),
+        "status_url": f"/admin/purge-jobs/{job['_id']}"
     }
+
+
+@router.get("/purge-jobs/{job_id}")
+async def purge_job_status(job_id: str, admin=Depends(admin_required)):
+    job = await get_purge_job(job_id)
+    if not job:
+        raise HTTPException(404, "Purge job not found")
+    return job_view(job)
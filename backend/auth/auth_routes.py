@@ -12,10 +12,12 @@ from .auth_utils import (
     create_session,
     get_current_user,
     calculate_session_duration,
+    destroy_session,
     _session_key,
     redis_client
 )
 from auth.api_key_utils import generate_api_key, hash_api_key
+from auth.principal_cache import invalidate_user
 from bson import ObjectId
 
 
@@ -171,7 +173,7 @@ def logout(response: Response, session_id: str = Cookie(None)):
 
     duration = calculate_session_duration(session_id)
 
-    redis_client.delete(key)
+    destroy_session(session_id)
     response.delete_cookie("session_id")
 
     log_event("logs_auth", {
@@ -225,6 +227,7 @@ def get_profile(user_id=Depends(get_current_user)):
         "email": user["email"],
         "is_admin": user.get("is_admin", False),
         "upload_limit": user.get("upload_limit", 0),
+        "result_cache_enabled": not user.get("result_cache_opt_out", False),
 
         # SAFE ACCESS
         "api_key": api_key_doc.get("raw_key") if api_key_doc else None,
@@ -241,3 +244,28 @@ def get_profile(user_id=Depends(get_current_user)):
     })
 
     return profile_data
+
+
+# ----------------------------------
+# ---- Result cache preference -----
+# ----------------------------------
+@router.put("/me/result-cache")
+def set_result_cache(enabled: bool, user_id=Depends(get_current_user)):
+    """Opt in / out of reusing earlier results for identical audio."""
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    users_collection.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"result_cache_opt_out": not enabled}}
+    )
+    invalidate_user(user_id)
+
+    log_event("logs_auth", {
+        "event": "result_cache_preference_updated",
+        "user_id": user_id,
+        "enabled": enabled,
+        "timestamp": int(time())
+    })
+
+    return {"result_cache_enabled": enabled}
@@ -1,5 +1,6 @@
 from passlib.context import CryptContext
 import redis
+import redis.asyncio
 import uuid
 import hashlib
 import time
@@ -9,6 +10,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Redis (Docker service name = redis)
 redis_client = redis.Redis(host="redis", port=6379, decode_responses=True)
+# Same server for async handlers (never call redis_client from the event loop)
+async_redis_client = redis.asyncio.Redis(host="redis", port=6379, decode_responses=True)
 
 SESSION_TTL = 3600  # 1 hour
 
@@ -18,6 +21,30 @@ SESSION_TTL = 3600  # 1 hour
 def _session_key(session_id: str) -> str:
     return f"session:{session_id}"
 
+
+# Secondary index of live sessions, maintained next to the session hashes:
+# a set of session ids per user and one sorted set of all sessions scored by
+# last_seen. Admin listings page through the sorted set and "log out
+# everywhere" reads the user's set, so neither has to SCAN the keyspace.
+SESSIONS_LAST_SEEN_KEY = "sessions:last_seen"
+
+
+def _user_sessions_key(user_id: str) -> str:
+    return f"user_sessions:{user_id}"
+
+
+def _index_session(pipe, session_id: str, user_id: str, now: int):
+    pipe.zadd(SESSIONS_LAST_SEEN_KEY, {session_id: now})
+    pipe.sadd(_user_sessions_key(user_id), session_id)
+    # The set outlives its newest session by at most one TTL
+    pipe.expire(_user_sessions_key(user_id), SESSION_TTL)
+
+
+def prune_session_index(now: int = None) -> int:
+    """Drop index entries for sessions idle past their TTL."""
+    now = now or int(time.time())
+    return redis_client.zremrangebyscore(SESSIONS_LAST_SEEN_KEY, "-inf", now - SESSION_TTL)
+
 # ---------------------------
 # AUTH HELPERS
 # ---------------------------
@@ -42,7 +69,8 @@ def create_session(user_id: int):
 
     key = _session_key(session_id)
 
-    redis_client.hset(
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hset(
         key,
         mapping={
             "user_id": user_id,
@@ -50,7 +78,9 @@ def create_session(user_id: int):
             "last_seen": now
         }
     )
-    redis_client.expire(key, SESSION_TTL)
+    pipe.expire(key, SESSION_TTL)
+    _index_session(pipe, session_id, str(user_id), now)
+    pipe.execute()
 
     # Log session creation
     from app_logger.logger import log_event
@@ -78,6 +108,7 @@ def get_current_user(session_id: str = Cookie(None)):
     data = redis_client.hgetall(key)
 
     if not data:
+        redis_client.zrem(SESSIONS_LAST_SEEN_KEY, session_id)
         log_event("logs_auth", {
             "event": "get_current_user_invalid_session",
             "session_id": session_id,
@@ -87,8 +118,11 @@ def get_current_user(session_id: str = Cookie(None)):
         return None
 
     now = int(time.time())
-    redis_client.hset(key, "last_seen", now)
-    redis_client.expire(key, SESSION_TTL)  # sliding session
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hset(key, "last_seen", now)
+    pipe.expire(key, SESSION_TTL)  # sliding session
+    _index_session(pipe, session_id, data["user_id"], now)
+    pipe.execute()
     
     log_event("logs_auth", {
         "event": "get_current_user_success",
@@ -137,7 +171,15 @@ def destroy_session(session_id: str):
     data = redis_client.hgetall(key)
     user_id = data.get("user_id") if data else None
     
-    redis_client.delete(key)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(key)
+    pipe.zrem(SESSIONS_LAST_SEEN_KEY, session_id)
+    if user_id:
+        pipe.srem(_user_sessions_key(user_id), session_id)
+    pipe.execute()
+
+    from auth.principal_cache import invalidate_session
+    invalidate_session(session_id)
     
     log_event("logs_auth", {
         "event": "session_destroyed",
@@ -147,6 +189,35 @@ def destroy_session(session_id: str):
     })
 
 
+def destroy_user_sessions(user_id: str) -> int:
+    """Log a user out everywhere; returns the number of live sessions ended."""
+    from app_logger.logger import log_event
+    from auth.principal_cache import invalidate_session
+
+    session_ids = list(redis_client.smembers(_user_sessions_key(user_id)))
+
+    pipe = redis_client.pipeline(transaction=True)
+    for session_id in session_ids:
+        pipe.delete(_session_key(session_id))
+    if session_ids:
+        pipe.zrem(SESSIONS_LAST_SEEN_KEY, *session_ids)
+    pipe.delete(_user_sessions_key(user_id))
+    results = pipe.execute()
+
+    # Members whose hash had already expired count as 0
+    ended = sum(results[:len(session_ids)])
+    for session_id in session_ids:
+        invalidate_session(session_id)
+
+    log_event("logs_auth", {
+        "event": "user_sessions_destroyed",
+        "user_id": user_id,
+        "sessions_ended": ended,
+        "timestamp": int(time.time())
+    })
+    return ended
+
+
 # =========================
 # API KEY AUTHENTICATION
 # =========================
@@ -1,5 +1,10 @@
 from pymongo import MongoClient
+from pymongo.errors import CollectionInvalid
 from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import os
 
 client = MongoClient("mongodb://audio-gateway-mongodb:27017")
 
@@ -10,4 +15,225 @@ sessions_collection = db["sessions"]
 logs_collection = db["logs"]
 api_keys_collection = db["api_keys"]
 usage_collection = db["usage"]
-transcriptions_collection = db["transcriptions"]
\ No newline at end of file
+transcriptions_collection = db["transcriptions"]
+purge_jobs_collection = db["purge_jobs"]
+# Gateway events (log_event); a time-series collection, see below.
+# App.log is the plain collection used before; migrate_logs.py copies it over.
+events_collection = db["app_events"]
+app_log_collection = db["App.log"]
+
+DAY_SEC = 24 * 3600
+
+
+def _retention_days(spec: str) -> dict:
+    days = {}
+    for item in spec.split(","):
+        if "=" in item:
+            category, value = item.split("=", 1)
+            days[category.strip()] = float(value)
+    return days
+
+
+# Event retention per log_event category; LOG_RETENTION_DEFAULT_DAYS is
+# the collection-wide expiry and so also the cap for every category
+LOG_RETENTION_DEFAULT_DAYS = float(os.getenv("LOG_RETENTION_DEFAULT_DAYS", "90"))
+LOG_RETENTION_DAYS = _retention_days(
+    os.getenv("LOG_RETENTION_DAYS", "logs_api=14,logs_usage=30,logs_auth=90")
+)
+
+
+# =====================================================
+# COLLECTION SPEC
+# =====================================================
+# Collections that need options at creation time. They are created on
+# first use (ensure_collection) instead of implicitly by an insert, which
+# would make a plain collection.
+COLLECTION_SPEC = {
+    "app_events": {
+        "timeseries": {
+            "timeField": "timestamp",
+            "metaField": "meta",  # {"collection": ..., "event": ...}
+            "granularity": "seconds"
+        },
+        "expireAfterSeconds": int(LOG_RETENTION_DEFAULT_DAYS * DAY_SEC)
+    }
+}
+
+
+def ensure_collection(name: str) -> bool:
+    """Create `name` with its COLLECTION_SPEC options; True if created."""
+    if name in db.list_collection_names(filter={"name": name}):
+        return False
+    try:
+        db.create_collection(name, **COLLECTION_SPEC[name])
+    except CollectionInvalid:
+        return False  # created concurrently
+    return True
+
+
+# =====================================================
+# INDEX SPEC
+# =====================================================
+# Every index the gateway relies on, per collection, in create_index terms:
+# "keys" plus any index options. init_db.py reconciles the live database
+# against this at startup: missing indexes are created, indexes whose
+# options differ (unique, partial filter, TTL, ...) or that are not listed
+# here are only reported, never dropped. `python init_db.py explain` shows
+# the query plans of the hot queries against these indexes.
+INDEX_SPEC = {
+    "users": [
+        # Login / register look up by username or email; the admin list
+        # sorts and prefix-searches on these columns (_id breaks ties)
+        {"keys": [("username", 1), ("_id", 1)]},
+        {"keys": [("email", 1), ("_id", 1)]},
+        {"keys": [("created_at", 1), ("_id", 1)]},
+        {"keys": [("upload_limit", 1), ("_id", 1)]}
+    ],
+    "api_keys": [
+        # x-api-key authentication
+        {"keys": [("key_hash", 1)]},
+        # Principal loading, /me, the admin list join
+        {"keys": [("user_id", 1)]}
+    ],
+    "transcriptions": [
+        {"keys": [("user_id", 1)]},
+        {"keys": [("created_at", -1)]},
+        {"keys": [("user_id", 1), ("created_at", -1)]},
+        # History pages: keyset on (created_at, _id) per user, optionally
+        # narrowed by mode. Equality, sort, then range: filename comes last
+        # so a prefix is filtered from the index keys without a SORT stage
+        {"keys": [("user_id", 1), ("created_at", -1), ("_id", -1), ("filename", 1)]},
+        {"keys": [("user_id", 1), ("mode", 1), ("created_at", -1), ("_id", -1), ("filename", 1)]},
+        # Blob references, checked before a shared result blob is deleted
+        {
+            "keys": [("result_ref", 1)],
+            "partialFilterExpression": {"result_ref": {"$exists": True}}
+        },
+        # Content-addressed result cache, per user
+        {
+            "keys": [("user_id", 1), ("content_hash", 1), ("created_at", -1)],
+            "partialFilterExpression": {"content_hash": {"$exists": True}}
+        }
+    ],
+    "usage": [
+        # Rollup upsert key; /admin/usage scans a bucket range
+        {
+            "keys": [("user_id", 1), ("granularity", 1), ("bucket", 1), ("mode", 1)],
+            "unique": True,
+            "partialFilterExpression": {"granularity": {"$exists": True}}
+        },
+        {"keys": [("granularity", 1), ("bucket", 1)]}
+    ],
+    "purge_jobs": [
+        {"keys": [("status", 1), ("created_at", 1)]},
+        {"keys": [("user_id", 1), ("created_at", -1)]}
+    ],
+    "app_events": [
+        # Created by MongoDB along with the time-series collection
+        {"keys": [("meta", 1), ("timestamp", 1)]},
+        # User purge, and tracing one request's events
+        {"keys": [("data.user_id", 1)]},
+        {"keys": [("data.request_id", 1)]},
+        # Retention per category: partial TTL indexes on the time field,
+        # filtered on the metadata (categories not listed keep the
+        # collection default)
+        *(
+            {
+                "keys": [("timestamp", 1)],
+                "name": f"ttl_{category}",
+                "expireAfterSeconds": int(days * DAY_SEC),
+                "partialFilterExpression": {"meta.collection": category}
+            }
+            for category, days in LOG_RETENTION_DAYS.items()
+            if days < LOG_RETENTION_DEFAULT_DAYS
+        )
+    ],
+    # App.log (pre time-series) keeps the indexes it has until it is
+    # migrated and dropped; it is not reconciled so it is never recreated
+
+    # Defined above but not queried by the gateway
+    "sessions": [],
+    "logs": []
+}
+
+
+# =====================================================
+# ASYNC ACCESS (for async def handlers)
+# =====================================================
+# pymongo is blocking, so async handlers must never call the collections
+# above directly: every call would stall the event loop (and with it every
+# other upload and websocket relay). Calls go through a dedicated, bounded
+# executor instead, sized to stay below the driver's connection pool.
+MONGO_EXECUTOR_WORKERS = int(os.getenv("MONGO_EXECUTOR_WORKERS", "16"))
+
+mongo_executor = ThreadPoolExecutor(
+    max_workers=MONGO_EXECUTOR_WORKERS,
+    thread_name_prefix="mongo"
+)
+
+
+async def run_in_db(fn, *args, **kwargs):
+    """Run a blocking pymongo call on the Mongo executor and await it."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        mongo_executor,
+        functools.partial(fn, *args, **kwargs)
+    )
+
+
+class AsyncCollection:
+    """
+    Awaitable view of a pymongo collection.
+
+    Single-document and write methods mirror pymongo's signatures.
+    Cursors are materialised on the executor with find_list()/aggregate_list(),
+    so no lazy cursor iteration ever happens on the event loop.
+    """
+
+    _METHODS = {
+        "find_one",
+        "find_one_and_update",
+        "insert_one",
+        "insert_many",
+        "update_one",
+        "update_many",
+        "delete_one",
+        "delete_many",
+        "count_documents",
+        "bulk_write",
+    }
+
+    def __init__(self, collection):
+        self.sync = collection
+
+    def __getattr__(self, name):
+        if name not in self._METHODS:
+            raise AttributeError(name)
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_db(method, *args, **kwargs)
+
+        return call
+
+    async def find_list(self, *args, sort=None, limit=0, **kwargs):
+        def _query():
+            cursor = self.sync.find(*args, **kwargs)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+
+        return await run_in_db(_query)
+
+    async def aggregate_list(self, pipeline, **kwargs):
+        return await run_in_db(
+            lambda: list(self.sync.aggregate(pipeline, **kwargs))
+        )
+
+
+async_users_collection = AsyncCollection(users_collection)
+async_api_keys_collection = AsyncCollection(api_keys_collection)
+async_usage_collection = AsyncCollection(usage_collection)
+async_transcriptions_collection = AsyncCollection(transcriptions_collection)
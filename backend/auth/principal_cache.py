@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from auth.mongo import users_collection, api_keys_collection
+from auth.auth_utils import get_current_user, redis_client
+from auth.api_key_utils import hash_api_key
+
+# =====================================================
+# PRINCIPAL CACHE (session / API key → user)
+# =====================================================
+# Every authenticated request used to resolve the user from Redis (session)
+# or Mongo (API key), and upload_audio then re-read the user and API key
+# documents. Resolved principals are kept in an in-process LRU with a short
+# TTL. Admin changes invalidate entries on every worker through Redis pub/sub.
+#
+# A principal is a plain dict:
+#   user_id, username, upload_limit, is_admin, result_cache,
+#   api_key_id, api_key_hash, api_key_active
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+INVALIDATION_CHANNEL = "principal_cache:invalidate"
+
+
+class PrincipalCache:
+    def __init__(self, maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (expires_at, principal)
+        self._by_user = {}              # user_id -> {keys}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return principal
+
+    def put(self, key: str, principal: dict):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, principal)
+            self._by_user.setdefault(principal["user_id"], set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_key(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id: str):
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _remove(self, key):
+        _, principal = self._entries.pop(key)
+        keys = self._by_user.get(principal["user_id"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[principal["user_id"]]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.maxsize,
+                "ttl_sec": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+def _session_cache_key(session_id: str) -> str:
+    return f"session:{session_id}"
+
+
+def _api_key_cache_key(key_hash: str) -> str:
+    return f"apikey:{key_hash}"
+
+
+# ---------------------------
+# LOADING
+# ---------------------------
+
+def load_principal(user_id: str, api_key_doc: dict = None):
+    try:
+        oid = ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return None
+
+    user = users_collection.find_one(
+        {"_id": oid},
+        {
+            "username": 1,
+            "upload_limit": 1,
+            "max_audio_duration_sec": 1,
+            "is_admin": 1,
+            "result_cache_opt_out": 1
+        }
+    )
+    if not user:
+        return None
+
+    if api_key_doc is None:
+        api_key_doc = api_keys_collection.find_one(
+            {"user_id": user_id},
+            {"key_hash": 1, "active": 1}
+        )
+
+    return {
+        "user_id": user_id,
+        "username": user["username"],
+        "upload_limit": user.get("upload_limit", 0),
+        "max_audio_duration": user.get("max_audio_duration_sec"),
+        "is_admin": user.get("is_admin", False),
+        "result_cache": not user.get("result_cache_opt_out", False),
+        "api_key_id": api_key_doc["_id"] if api_key_doc else None,
+        "api_key_hash": api_key_doc.get("key_hash") if api_key_doc else None,
+        "api_key_active": api_key_doc.get("active", False) if api_key_doc else False
+    }
+
+
+def resolve_session(session_id: str):
+    """Principal for a session cookie, or None if the session is invalid."""
+    key = _session_cache_key(session_id)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    # Miss: validates the session and slides its Redis TTL
+    user_id = get_current_user(session_id)
+    if not user_id:
+        return None
+
+    principal = load_principal(user_id)
+    if principal:
+        principal_cache.put(key, principal)
+    return principal
+
+
+def resolve_api_key(raw_key: str):
+    """
+    Principal owning an API key, or None if the key is unknown.
+    Inactive keys resolve too; callers check "api_key_active".
+    """
+    key_hash = hash_api_key(raw_key)
+    key = _api_key_cache_key(key_hash)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+
+    api_key_doc = api_keys_collection.find_one(
+        {"key_hash": key_hash},
+        {"user_id": 1, "key_hash": 1, "active": 1}
+    )
+    if not api_key_doc:
+        return None
+
+    principal = load_principal(api_key_doc["user_id"], api_key_doc)
+    if principal:
+        principal_cache.put(key, principal)
+    return principal
+
+
+# ---------------------------
+# INVALIDATION (all workers)
+# ---------------------------
+
+def _publish(message: dict):
+    try:
+        redis_client.publish(INVALIDATION_CHANNEL, json.dumps(message))
+    except Exception as e:
+        print(f"❌ Principal cache invalidation publish error: {e}")
+
+
+def invalidate_user(user_id: str):
+    principal_cache.invalidate_user(user_id)
+    _publish({"user_id": user_id})
+
+
+def invalidate_session(session_id: str):
+    key = _session_cache_key(session_id)
+    principal_cache.invalidate_key(key)
+    _publish({"key": key})
+
+
+def _apply(message: dict):
+    if message.get("user_id"):
+        principal_cache.invalidate_user(message["user_id"])
+    if message.get("key"):
+        principal_cache.invalidate_key(message["key"])
+
+
+def _listen(stop: threading.Event):
+    while not stop.is_set():
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            while not stop.is_set():
+                msg = pubsub.get_message(timeout=1.0)
+                if msg and msg.get("type") == "message":
+                    _apply(json.loads(msg["data"]))
+        except Exception as e:
+            print(f"❌ Principal cache listener error: {e}")
+            # A missed message could leave stale entries: start clean
+            principal_cache.clear()
+            stop.wait(2)
+        finally:
+            pubsub.close()
+
+
+_listener_stop = threading.Event()
+
+
+def start_invalidation_listener():
+    _listener_stop.clear()
+    threading.Thread(
+        target=_listen,
+        args=(_listener_stop,),
+        name="principal-cache-invalidation",
+        daemon=True
+    ).start()
+
+
+def stop_invalidation_listener():
+    _listener_stop.set()
@@ -0,0 +1,118 @@
+"""
+Admin user list: per-user api_keys lookups vs one $lookup aggregation.
+
+Fills a scratch database with N synthetic users (each with an API key
+document, as /register creates them) and times:
+
+  n+1        the previous list_users: every user, then one api_keys
+             find_one per user
+  page 1     GET /admin/users default page (aggregation + count)
+  deep page  a page in the middle of the list
+  search     a username/email prefix search
+
+Needs a running MongoDB (the one configured in auth/mongo.py); the scratch
+database is dropped afterwards unless --keep is given.
+
+Usage (from backend/):
+    python -m benchmarks.bench_admin_users --users 10000,100000
+"""
+import argparse
+import statistics
+import time
+
+from bson import ObjectId
+
+from auth.admin_routes import _user_filter, user_list_pipeline
+from auth.mongo import client
+
+PAGE_SIZE = 50
+
+
+def _seed(db, n):
+    users, keys = db["users"], db["api_keys"]
+    users.drop()
+    keys.drop()
+
+    batch_users, batch_keys = [], []
+    for i in range(n):
+        uid = ObjectId()
+        batch_users.append({
+            "_id": uid,
+            "username": f"user{i:07d}",
+            "email": f"user{i:07d}@example.com",
+            "password": "x" * 60,
+            "upload_limit": 50 + i % 100,
+            "created_at": 1_700_000_000 + i
+        })
+        batch_keys.append({
+            "user_id": str(uid),
+            "raw_key": "k" * 48,
+            "key_hash": "h" * 64,
+            "active": i % 3 != 0,
+            "created_at": 1_700_000_000 + i
+        })
+        if len(batch_users) == 5000:
+            users.insert_many(batch_users)
+            keys.insert_many(batch_keys)
+            batch_users, batch_keys = [], []
+    if batch_users:
+        users.insert_many(batch_users)
+        keys.insert_many(batch_keys)
+
+    # Same indexes as init_db.py
+    for field in ("username", "email", "created_at", "upload_limit"):
+        users.create_index([(field, 1), ("_id", 1)])
+    keys.create_index("user_id")
+
+
+def _n_plus_one(db):
+    out = []
+    for u in db["users"].find({}, {"password": 0}):
+        key = db["api_keys"].find_one({"user_id": str(u["_id"])})
+        out.append((u["username"], key.get("active") if key else False))
+    return out
+
+
+def _page(db, page, search=None):
+    match = _user_filter(search)
+    items = list(db["users"].aggregate(
+        user_list_pipeline(match, "username", 1, (page - 1) * PAGE_SIZE, PAGE_SIZE)
+    ))
+    total = db["users"].count_documents(match)
+    return items, total
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", default="10000,100000", help="comma-separated sizes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--db", default="audio_gateway_bench")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    args = parser.parse_args()
+
+    db = client[args.db]
+    try:
+        print(f"{'users':>8}  {'n+1 ms':>10}  {'page 1 ms':>10}  {'deep ms':>10}  {'search ms':>10}")
+        for n in (int(s) for s in args.users.split(",")):
+            _seed(db, n)
+            n_plus_one = _time(lambda: _n_plus_one(db), 1)
+            first = _time(lambda: _page(db, 1), args.repeat)
+            deep = _time(lambda: _page(db, max(1, n // PAGE_SIZE // 2)), args.repeat)
+            search = _time(lambda: _page(db, 1, "user00012"), args.repeat)
+            print(f"{n:>8}  {n_plus_one:>10.1f}  {first:>10.1f}  {deep:>10.1f}  {search:>10.1f}")
+    finally:
+        if not args.keep:
+            client.drop_database(args.db)
+
+
+if __name__ == "__main__":
+    main()
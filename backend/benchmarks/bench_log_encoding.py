@@ -0,0 +1,95 @@
+"""
+Events-per-second micro-benchmark for log_event.
+
+"before" replays the previous log_event body (recursive _sanitize copy,
+json.dumps(default=str), box-drawing print per field). "dev" and "prod" run
+the current app_logger.logger.log_event in each LOG_MODE. Console and file
+output go to /dev/null and the Mongo sink is replaced by a no-op so only the
+encoding / console cost is measured.
+
+Usage (from backend/):
+    python -m benchmarks.bench_log_encoding --events 20000
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from bson import ObjectId
+
+import app_logger.logger as app_log
+
+
+def _legacy_sanitize(data):
+    if isinstance(data, dict):
+        return {k: _legacy_sanitize(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_legacy_sanitize(i) for i in data]
+    if isinstance(data, ObjectId):
+        return str(data)
+    if isinstance(data, datetime):
+        return data.isoformat()
+    return data
+
+
+def _legacy_log_event(collection, data):
+    safe_data = _legacy_sanitize(data)
+    log_entry = {"collection": collection, "data": safe_data, "timestamp": time.time()}
+    print("\n" + "═" * 80)
+    print(f"🧾 LOG EVENT → {collection}")
+    print("═" * 80)
+    for k, v in safe_data.items():
+        print(f"{k:<18}: {v}")
+    print("═" * 80)
+    app_log.logger.info(json.dumps(log_entry, default=str))
+
+
+def _sample_event():
+    return {
+        "event": "upload_completed",
+        "user_id": ObjectId(),
+        "username": "bench_user",
+        "filename": "meeting_recording.wav",
+        "mode": "diarize",
+        "processing_time": 42,
+        "created_at": datetime.utcnow(),
+        "timestamp": int(time.time())
+    }
+
+
+def _rate(fn, events):
+    event = _sample_event()
+    started = time.perf_counter()
+    for _ in range(events):
+        fn("logs_api", event)
+    return events / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    devnull = open(os.devnull, "w")
+    for handler in app_log.logger.handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(devnull)
+    app_log.log_sink.submit = lambda entry: True
+
+    results = {}
+    with contextlib.redirect_stdout(devnull):
+        results["before"] = _rate(_legacy_log_event, args.events)
+        app_log.DEV_LOGS = True
+        results["dev"] = _rate(app_log.log_event, args.events)
+        app_log.DEV_LOGS = False
+        results["prod"] = _rate(app_log.log_event, args.events)
+
+    for label, eps in results.items():
+        print(f"{label:<7}: {eps:>10,.0f} events/s  ({eps / results['before']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
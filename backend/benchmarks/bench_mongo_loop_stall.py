@@ -0,0 +1,90 @@
+"""
+Event-loop stall benchmark for the Mongo access layer.
+
+Simulates N parallel uploads, each doing the handful of Mongo round trips
+`upload_audio` makes, and measures how late a 5 ms heartbeat task runs on the
+event loop. Compares calling pymongo directly from the coroutine (old
+behaviour) with going through `auth.mongo.run_in_db`.
+
+By default a blocking `time.sleep` stands in for the round trip so the script
+runs without a database. Pass --real to hit the configured MongoDB instead.
+
+Usage (from backend/):
+    python -m benchmarks.bench_mongo_loop_stall --uploads 50 --latency-ms 5
+"""
+import argparse
+import asyncio
+import time
+
+from auth.mongo import run_in_db, users_collection
+
+CALLS_PER_UPLOAD = 4  # user lookup, api key lookup, last_used update, insert
+HEARTBEAT_SEC = 0.005
+
+
+def _blocking_call(latency, real):
+    if real:
+        users_collection.find_one({})
+    else:
+        time.sleep(latency)
+
+
+async def _heartbeat(stop, lags):
+    while not stop.is_set():
+        expected = time.perf_counter() + HEARTBEAT_SEC
+        await asyncio.sleep(HEARTBEAT_SEC)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def _upload_direct(latency, real):
+    for _ in range(CALLS_PER_UPLOAD):
+        _blocking_call(latency, real)
+        await asyncio.sleep(0)
+
+
+async def _upload_executor(latency, real):
+    for _ in range(CALLS_PER_UPLOAD):
+        await run_in_db(_blocking_call, latency, real)
+
+
+async def _run(upload_fn, uploads, latency, real):
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(_heartbeat(stop, lags))
+    await asyncio.sleep(HEARTBEAT_SEC * 2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(upload_fn(latency, real) for _ in range(uploads)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+    lags.sort()
+    return {
+        "elapsed_sec": elapsed,
+        "max_stall_ms": lags[-1] * 1000 if lags else 0.0,
+        "p99_stall_ms": lags[int(len(lags) * 0.99) - 1] * 1000 if lags else 0.0,
+        "heartbeats": len(lags),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--real", action="store_true")
+    args = parser.parse_args()
+
+    latency = args.latency_ms / 1000
+    for label, fn in (("direct pymongo", _upload_direct), ("run_in_db", _upload_executor)):
+        stats = asyncio.run(_run(fn, args.uploads, latency, args.real))
+        print(
+            f"{label:<15}: total {stats['elapsed_sec']:.3f}s | "
+            f"max loop stall {stats['max_stall_ms']:.1f} ms | "
+            f"p99 stall {stats['p99_stall_ms']:.1f} ms | "
+            f"heartbeats {stats['heartbeats']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
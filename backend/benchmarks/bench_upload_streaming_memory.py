@@ -0,0 +1,82 @@
+"""
+Peak-memory check for the streaming upload proxy.
+
+Builds spooled UploadFiles of increasing size on disk and measures the
+Python heap peak (tracemalloc) while producing the multipart body sent to
+the backend: once with the old `await file.read()` buffering and once with
+`gateway.streaming.multipart_upload`. The streamed peak should stay flat at
+roughly the chunk size whatever the file size; the script exits 1 when it does not, so it can
+run as a check.
+
+Usage (from backend/):
+    python -m benchmarks.bench_upload_streaming_memory --sizes-mb 8 64 256
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import tracemalloc
+
+from starlette.datastructures import UploadFile
+
+from gateway.streaming import UPLOAD_CHUNK_SIZE, multipart_upload
+
+WRITE_BLOCK = b"\x00" * (1024 * 1024)
+
+
+def _make_upload(size_mb):
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    for _ in range(size_mb):
+        spooled.write(WRITE_BLOCK)
+    spooled.seek(0)
+    return UploadFile(spooled, size=size_mb * len(WRITE_BLOCK), filename="bench.wav")
+
+
+async def _buffered(upload):
+    content = await upload.read()
+    return len(content)
+
+
+async def _streamed(upload):
+    _, body = multipart_upload(upload)
+    sent = 0
+    async for chunk in body:
+        sent += len(chunk)
+    return sent
+
+
+def _peak_mb(fn, upload):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    sent = asyncio.run(fn(upload))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return sent, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[8, 64, 256])
+    args = parser.parse_args()
+
+    print(f"chunk size: {UPLOAD_CHUNK_SIZE / 1024:.0f} KB")
+    peaks = []
+    for size_mb in args.sizes_mb:
+        upload = _make_upload(size_mb)
+        _, buffered_peak = _peak_mb(_buffered, upload)
+        sent, streamed_peak = _peak_mb(_streamed, upload)
+        upload.file.close()
+        peaks.append(streamed_peak)
+        print(
+            f"{size_mb:>5} MB file | buffered peak {buffered_peak:8.2f} MB | "
+            f"streamed peak {streamed_peak:6.2f} MB | sent {sent} bytes"
+        )
+
+    flat = max(peaks) <= 4 * UPLOAD_CHUNK_SIZE / (1024 * 1024) + 1
+    print("streamed memory flat:", "yes" if flat else "NO")
+    if not flat:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+End-to-end frame latency of the /ws/diarize bridge: lockstep vs duplex.
+
+Starts a fake diarization backend that answers every audio frame after a
+processing delay (with occasional slow spikes) and a bridge that relays a
+client socket to it, either with the previous receive/send/recv/forward
+loop ("lockstep") or with gateway.ws_relay.relay ("duplex"). A client sends
+frames at a fixed real-time interval and records the time until the result
+for each frame arrives. Per-frame log_event calls are disabled for both.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ws_relay --frames 300 --interval-ms 20 --delay-ms 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import struct
+import time
+
+import websockets
+from fastapi import WebSocketDisconnect
+from websockets.exceptions import ConnectionClosed
+
+import gateway.ws_relay as ws_relay
+
+FRAME_PADDING = b"\x00" * 3200  # ~100 ms of 16 kHz PCM16
+
+
+class _ClientSide:
+    """The bits of starlette's WebSocket API the relays use."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def receive_bytes(self):
+        try:
+            return await self.conn.recv()
+        except ConnectionClosed:
+            raise WebSocketDisconnect()
+
+    async def send_text(self, text):
+        await self.conn.send(text)
+
+    async def send_json(self, data):
+        await self.conn.send(json.dumps(data))
+
+
+async def _lockstep(ws, backend_ws):
+    # The bridge loop before the duplex relay
+    while True:
+        data = await ws.receive_bytes()
+        await backend_ws.send(data)
+        result = await backend_ws.recv()
+        await ws.send_json(json.loads(result))
+
+
+async def _duplex(ws, backend_ws):
+    await ws_relay.relay(ws, backend_ws)
+
+
+def _fake_backend(delay, spike_delay, spike_rate):
+    async def handler(conn):
+        async def answer(frame):
+            slow = random.random() < spike_rate
+            await asyncio.sleep(spike_delay if slow else delay)
+            seq, = struct.unpack_from("!I", frame)
+            await conn.send(json.dumps({"seq": seq, "segments": []}))
+
+        async for frame in conn:
+            asyncio.ensure_future(answer(frame))
+    return handler
+
+
+async def _run(bridge, args):
+    random.seed(args.seed)
+    backend = await websockets.serve(
+        _fake_backend(args.delay_ms / 1000, args.spike_ms / 1000, args.spike_rate),
+        "127.0.0.1", 0
+    )
+    backend_url = f"ws://127.0.0.1:{backend.sockets[0].getsockname()[1]}"
+
+    async def gateway_handler(conn):
+        async with websockets.connect(backend_url, max_size=None) as backend_ws:
+            try:
+                await bridge(_ClientSide(conn), backend_ws)
+            except (WebSocketDisconnect, ConnectionClosed):
+                pass
+
+    gateway = await websockets.serve(gateway_handler, "127.0.0.1", 0)
+    gateway_url = f"ws://127.0.0.1:{gateway.sockets[0].getsockname()[1]}"
+
+    sent_at = {}
+    latencies = []
+    async with websockets.connect(gateway_url, max_size=None) as client:
+        async def receive():
+            while len(latencies) < args.frames:
+                seq = json.loads(await client.recv())["seq"]
+                latencies.append((time.perf_counter() - sent_at[seq]) * 1000)
+
+        receiver = asyncio.ensure_future(receive())
+        for seq in range(args.frames):
+            sent_at[seq] = time.perf_counter()
+            await client.send(struct.pack("!I", seq) + FRAME_PADDING)
+            await asyncio.sleep(args.interval_ms / 1000)
+        try:
+            await asyncio.wait_for(receiver, timeout=args.timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    gateway.close()
+    backend.close()
+    return latencies
+
+
+def _report(name, latencies, frames):
+    if not latencies:
+        print(f"{name:<9} no results")
+        return
+    ordered = sorted(latencies)
+    p95 = ordered[int(0.95 * (len(ordered) - 1))]
+    print(
+        f"{name:<9} results {len(latencies):>4}/{frames}  "
+        f"p50 {statistics.median(ordered):8.1f} ms  "
+        f"p95 {p95:8.1f} ms  max {ordered[-1]:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--interval-ms", type=float, default=20)
+    parser.add_argument("--delay-ms", type=float, default=30)
+    parser.add_argument("--spike-ms", type=float, default=300)
+    parser.add_argument("--spike-rate", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    ws_relay.log_event = lambda *a, **k: None
+
+    print(
+        f"{args.frames} frames every {args.interval_ms:g} ms, backend delay "
+        f"{args.delay_ms:g} ms ({args.spike_rate:.0%} spikes of {args.spike_ms:g} ms)"
+    )
+    for name, bridge in (("lockstep", _lockstep), ("duplex", _duplex)):
+        _report(name, asyncio.run(_run(bridge, args)), args.frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import os
+import struct
+
+# =====================================================
+# HEADER-ONLY AUDIO DURATION PROBE
+# =====================================================
+# Duration of an upload from its container metadata, without decoding:
+#
+#   WAV        RIFF "fmt " byte rate and "data" chunk size
+#   MP3        Xing/Info or VBRI frame count, else CBR bitrate x file size
+#   OGG        granule position of the last page (Opus / Vorbis)
+#   WebM/MKV   Segment Info Duration, else the last cluster's timecode
+#              (MediaRecorder files have no Duration)
+#   M4A/MP4    "mvhd" timescale and duration
+#
+# Only the first few KB and, where needed, the last PROBE_TAIL_BYTES are
+# read. Anything unrecognised or malformed gives a duration of None.
+
+PROBE_HEAD_BYTES = 64 * 1024
+PROBE_TAIL_BYTES = int(os.getenv("PROBE_TAIL_BYTES", str(256 * 1024)))
+# Longest accepted upload in seconds (0 = no limit); per-user
+# max_audio_duration_sec overrides it
+MAX_AUDIO_DURATION_SEC = float(os.getenv("MAX_AUDIO_DURATION_SEC", "0"))
+
+
+def max_audio_duration(principal: dict) -> float:
+    limit = principal.get("max_audio_duration")
+    return MAX_AUDIO_DURATION_SEC if limit is None else limit
+
+
+def probe_duration(fileobj):
+    """(format, duration_sec) of an audio file; duration is None when unknown."""
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    head = fileobj.read(12)
+
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        fmt, probe = "wav", _wav
+    elif head[:4] == b"OggS":
+        fmt, probe = "ogg", _ogg
+    elif head[:4] == b"\x1a\x45\xdf\xa3":
+        fmt, probe = "webm", _webm
+    elif head[4:8] == b"ftyp":
+        fmt, probe = "mp4", _mp4
+    elif head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        fmt, probe = "mp3", _mp3
+    else:
+        return None, None
+
+    try:
+        duration = probe(fileobj, size)
+    except (struct.error, ValueError, IndexError, ZeroDivisionError):
+        duration = None
+    finally:
+        fileobj.seek(0)
+
+    if duration is not None:
+        duration = round(duration, 2)
+    return fmt, duration
+
+
+def _tail(fileobj, size: int) -> bytes:
+    fileobj.seek(max(0, size - PROBE_TAIL_BYTES))
+    return fileobj.read()
+
+
+# ---------------------------
+# WAV
+# ---------------------------
+
+def _wav(f, size):
+    f.seek(12)
+    byte_rate = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        chunk_id, chunk_size = header[:4], struct.unpack("<I", header[4:])[0]
+
+        if chunk_id == b"fmt ":
+            fmt = f.read(16)
+            byte_rate = struct.unpack_from("<I", fmt, 8)[0]
+            f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+        elif chunk_id == b"data":
+            remaining = size - f.tell()
+            # Streaming writers leave the size at 0 or 0xFFFFFFFF
+            data_size = remaining if chunk_size in (0, 0xFFFFFFFF) else min(chunk_size, remaining)
+            return data_size / byte_rate if byte_rate else None
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+# ---------------------------
+# MP3 (MPEG audio layer III)
+# ---------------------------
+
+_MP3_BITRATES_V1 = (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320)
+_MP3_BITRATES_V2 = (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160)
+# version bits -> sample rates (0: MPEG 2.5, 2: MPEG 2, 3: MPEG 1)
+_MP3_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+
+def _mp3_frame(buf, i):
+    """(mpeg1, sample_rate, bitrate, frame_len, mono) for a frame header at i, or None."""
+    if buf[i] != 0xFF or buf[i + 1] & 0xE0 != 0xE0:
+        return None
+    version = (buf[i + 1] >> 3) & 3
+    layer = (buf[i + 1] >> 1) & 3
+    bitrate_idx = buf[i + 2] >> 4
+    rate_idx = (buf[i + 2] >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+
+    mpeg1 = version == 3
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_idx]
+    bitrate = (_MP3_BITRATES_V1 if mpeg1 else _MP3_BITRATES_V2)[bitrate_idx] * 1000
+    padding = (buf[i + 2] >> 1) & 1
+    frame_len = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+    return mpeg1, sample_rate, bitrate, frame_len, buf[i + 3] >> 6 == 3
+
+
+def _mp3(f, size):
+    f.seek(0)
+    header = f.read(10)
+    start = 0
+    if header[:3] == b"ID3":
+        tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+
+    f.seek(start)
+    buf = f.read(PROBE_HEAD_BYTES)
+    for i in range(len(buf) - 4):
+        frame = _mp3_frame(buf, i)
+        if frame is None:
+            continue
+        mpeg1, sample_rate, bitrate, frame_len, mono = frame
+        # Require the next frame to line up, to skip false syncs
+        nxt = i + frame_len
+        if nxt + 4 <= len(buf) and _mp3_frame(buf, nxt) is None:
+            continue
+
+        samples_per_frame = 1152 if mpeg1 else 576
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+
+        xing = i + 4 + side_info
+        if buf[xing:xing + 4] in (b"Xing", b"Info"):
+            flags = struct.unpack_from(">I", buf, xing + 4)[0]
+            if flags & 1:
+                frames = struct.unpack_from(">I", buf, xing + 8)[0]
+                return frames * samples_per_frame / sample_rate
+
+        vbri = i + 4 + 32
+        if buf[vbri:vbri + 4] == b"VBRI":
+            frames = struct.unpack_from(">I", buf, vbri + 14)[0]
+            return frames * samples_per_frame / sample_rate
+
+        audio_bytes = size - (start + i)
+        f.seek(max(0, size - 128))
+        if f.read(3) == b"TAG":
+            audio_bytes -= 128
+        return audio_bytes * 8 / bitrate
+    return None
+
+
+# ---------------------------
+# OGG (Opus / Vorbis)
+# ---------------------------
+
+def _ogg(f, size):
+    f.seek(0)
+    head = f.read(4096)
+    body = 27 + head[26]
+    packet = head[body:body + 32]
+
+    if packet[:8] == b"OpusHead":
+        rate = 48000
+        pre_skip = struct.unpack_from("<H", packet, 10)[0]
+    elif packet[:7] == b"\x01vorbis":
+        rate = struct.unpack_from("<I", packet, 12)[0]
+        pre_skip = 0
+    else:
+        return None
+
+    serial = head[14:18]
+    tail = _tail(f, size)
+    pos = tail.rfind(b"OggS")
+    while pos >= 0:
+        if pos + 18 <= len(tail) and tail[pos + 14:pos + 18] == serial:
+            granule = struct.unpack_from("<q", tail, pos + 6)[0]
+            if granule >= 0:
+                return max(0, granule - pre_skip) / rate
+        pos = tail.rfind(b"OggS", 0, pos)
+    return None
+
+
+# ---------------------------
+# WebM / Matroska (EBML)
+# ---------------------------
+
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549A966
+_EBML_TIMECODE_SCALE = 0x2AD7B1
+_EBML_DURATION = 0x4489
+_EBML_CLUSTER = 0x1F43B675
+_EBML_CLUSTER_TIMECODE = 0xE7
+_EBML_SIMPLE_BLOCK = 0xA3
+_EBML_BLOCK_GROUP = 0xA0
+_EBML_BLOCK = 0xA1
+
+
+def _vint(buf, pos, marker=False):
+    """(value, length) of an EBML variable-size integer; value -1 = unknown size."""
+    first = buf[pos]
+    if first == 0:
+        raise ValueError("invalid EBML vint")
+    length = 9 - first.bit_length()
+    value = first if marker else first & ((1 << (8 - length)) - 1)
+    for b in buf[pos + 1:pos + length]:
+        value = (value << 8) | b
+    if not marker and value == (1 << (7 * length)) - 1:
+        value = -1
+    return value, length
+
+
+def _ebml_children(buf, start, end):
+    """Yield (id, data_start, data_size) of the elements in buf[start:end]."""
+    pos = start
+    while pos < end - 1:
+        element_id, n = _vint(buf, pos, marker=True)
+        size, m = _vint(buf, pos + n)
+        data = pos + n + m
+        yield element_id, data, size
+        if size < 0:
+            return
+        pos = data + size
+
+
+def _block_timecode(buf, pos):
+    _, n = _vint(buf, pos)  # track number
+    return struct.unpack_from(">h", buf, pos + n)[0]
+
+
+def _webm(f, size):
+    f.seek(0)
+    head = f.read(PROBE_HEAD_BYTES)
+    scale = 1_000_000  # ns per timecode unit (Matroska default)
+
+    for element_id, data, length in _ebml_children(head, 0, len(head)):
+        if element_id != _EBML_SEGMENT:
+            continue
+        segment_end = len(head) if length < 0 else min(len(head), data + length)
+        for child_id, child, child_len in _ebml_children(head, data, segment_end):
+            if child_id == _EBML_CLUSTER:
+                break
+            if child_id != _EBML_INFO:
+                continue
+            duration = None
+            for info_id, value, value_len in _ebml_children(head, child, child + child_len):
+                raw = head[value:value + value_len]
+                if info_id == _EBML_TIMECODE_SCALE:
+                    scale = int.from_bytes(raw, "big")
+                elif info_id == _EBML_DURATION:
+                    duration = struct.unpack(">f" if value_len == 4 else ">d", raw)[0]
+            if duration:
+                return duration * scale / 1e9
+            break
+        break
+
+    # No Duration (live recordings): timecode of the last block in the file
+    tail = _tail(f, size)
+    pos = tail.rfind(b"\x1f\x43\xb6\x75")
+    while pos >= 0:
+        try:
+            size_value, n = _vint(tail, pos + 4)
+            start = pos + 4 + n
+            end = len(tail) if size_value < 0 else min(len(tail), start + size_value)
+            cluster_tc, last = None, 0
+            for element_id, data, length in _ebml_children(tail, start, end):
+                if data + max(length, 0) > len(tail):
+                    break
+                if element_id == _EBML_CLUSTER_TIMECODE:
+                    cluster_tc = int.from_bytes(tail[data:data + length], "big")
+                elif element_id == _EBML_SIMPLE_BLOCK:
+                    last = max(last, _block_timecode(tail, data))
+                elif element_id == _EBML_BLOCK_GROUP:
+                    for sub_id, sub, _ in _ebml_children(tail, data, data + length):
+                        if sub_id == _EBML_BLOCK:
+                            last = max(last, _block_timecode(tail, sub))
+            if cluster_tc is not None:
+                return (cluster_tc + last) * scale / 1e9
+        except (ValueError, IndexError, struct.error):
+            pass
+        pos = tail.rfind(b"\x1f\x43\xb6\x75", 0, pos)
+    return None
+
+
+# ---------------------------
+# M4A / MP4 (ISO BMFF)
+# ---------------------------
+
+def _boxes(f, start, end):
+    """Yield (type, data_start, box_end) of the boxes between start and end."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(16)
+        box_size, box_type = struct.unpack(">I4s", header[:8])
+        header_len = 8
+        if box_size == 1:
+            box_size = struct.unpack(">Q", header[8:16])[0]
+            header_len = 16
+        elif box_size == 0:
+            box_size = end - pos
+        if box_size < header_len:
+            return
+        yield box_type, pos + header_len, pos + box_size
+        pos += box_size
+
+
+def _mp4(f, size):
+    for box_type, data, box_end in _boxes(f, 0, size):
+        if box_type != b"moov":
+            continue
+        for child_type, child, _ in _boxes(f, data, box_end):
+            if child_type != b"mvhd":
+                continue
+            f.seek(child)
+            mvhd = f.read(32)
+            if mvhd[0] == 1:
+                timescale, duration = struct.unpack_from(">IQ", mvhd, 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", mvhd, 12)
+            # Fragmented files may leave mvhd duration at 0
+            return duration / timescale if duration else None
+    return None
@@ -0,0 +1,207 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+from app_logger.logger import log_event
+
+# =====================================================
+# MULTI-NODE BACKEND POOL
+# =====================================================
+# TRANSCRIBE_API / DIARIZE_API accept a comma-separated list of nodes. Each
+# upload (and each live /ws/diarize session) goes to the healthy node with
+# the fewest outstanding requests. Nodes are ejected after consecutive
+# failures (passive, from real traffic, or active, from the periodic health
+# check) and readmitted as soon as a health check succeeds again.
+
+BACKEND_HEALTH_INTERVAL = float(os.getenv("BACKEND_HEALTH_INTERVAL", "10"))
+BACKEND_HEALTH_TIMEOUT = float(os.getenv("BACKEND_HEALTH_TIMEOUT", "3"))
+# Path probed on each node's origin; empty = GET the node URL itself.
+# Any response below 500 counts as alive.
+BACKEND_HEALTH_PATH = os.getenv("BACKEND_HEALTH_PATH", "")
+BACKEND_EJECT_AFTER = int(os.getenv("BACKEND_EJECT_AFTER", "3"))
+# Extra nodes tried when connecting to the chosen one fails
+BACKEND_RETRIES = int(os.getenv("BACKEND_RETRIES", "2"))
+
+
+class NoBackendAvailable(Exception):
+    pass
+
+
+class BackendNodeError(Exception):
+    """A 5xx answer: counted against the node, but not retried elsewhere."""
+    def __init__(self, response):
+        super().__init__(f"backend returned {response.status_code}")
+        self.response = response
+
+
+class BackendNode:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+
+        self.requests = 0
+        self.errors = 0
+        self.latency_ewma_ms = None
+        self.last_error = None
+        self.ejected_at = None
+
+    @property
+    def health_url(self) -> str:
+        if not BACKEND_HEALTH_PATH:
+            return self.url
+        parts = urlsplit(self.url)
+        return f"{parts.scheme}://{parts.netloc}{BACKEND_HEALTH_PATH}"
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ewma_ms": round(self.latency_ewma_ms, 1) if self.latency_ewma_ms else None,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "ejected_at": self.ejected_at
+        }
+
+
+class BackendPool:
+    def __init__(self, name: str, urls: list[str]):
+        self.name = name
+        self.nodes = [BackendNode(u) for u in urls]
+        self._rr = 0
+
+    def pick(self, exclude=()) -> BackendNode:
+        """Healthy node with the fewest outstanding requests (round-robin on ties)."""
+        candidates = [n for n in self.nodes if n.url not in exclude]
+        if not candidates:
+            raise NoBackendAvailable(f"No {self.name} backend configured or left to try")
+
+        healthy = [n for n in candidates if n.healthy]
+        # Fail open: if every node is ejected, still try the least loaded one
+        pool = healthy or candidates
+
+        self._rr = (self._rr + 1) % len(pool)
+        rotated = pool[self._rr:] + pool[:self._rr]
+        return min(rotated, key=lambda n: n.outstanding)
+
+    @asynccontextmanager
+    async def track(self, node: BackendNode):
+        """Count a request as outstanding on a node and record its outcome."""
+        node.outstanding += 1
+        node.requests += 1
+        started = time.monotonic()
+        try:
+            yield node
+        except Exception as e:
+            self.mark_failure(node, e)
+            raise
+        else:
+            elapsed_ms = (time.monotonic() - started) * 1000
+            node.latency_ewma_ms = (
+                elapsed_ms if node.latency_ewma_ms is None
+                else 0.8 * node.latency_ewma_ms + 0.2 * elapsed_ms
+            )
+            self.mark_success(node)
+        finally:
+            node.outstanding -= 1
+
+    @asynccontextmanager
+    async def session(self, node: BackendNode):
+        """Count a long-lived connection (live WS relay) as outstanding."""
+        node.outstanding += 1
+        node.requests += 1
+        try:
+            yield node
+        finally:
+            node.outstanding -= 1
+
+    def mark_success(self, node: BackendNode):
+        node.consecutive_failures = 0
+        if not node.healthy:
+            node.healthy = True
+            node.ejected_at = None
+            log_event("logs_api", {
+                "event": "backend_node_readmitted",
+                "backend": self.name,
+                "node": node.url,
+                "timestamp": int(time.time())
+            })
+
+    def mark_failure(self, node: BackendNode, error, count_error: bool = True):
+        if count_error:
+            node.errors += 1
+        node.consecutive_failures += 1
+        node.last_error = str(error) or type(error).__name__
+        if node.healthy and node.consecutive_failures >= BACKEND_EJECT_AFTER:
+            node.healthy = False
+            node.ejected_at = int(time.time())
+            log_event("logs_api", {
+                "event": "backend_node_ejected",
+                "backend": self.name,
+                "node": node.url,
+                "error": node.last_error,
+                "timestamp": int(time.time())
+            })
+
+    async def check(self, client):
+        async def probe(node):
+            try:
+                r = await client.get(node.health_url, timeout=BACKEND_HEALTH_TIMEOUT)
+                if r.status_code >= 500:
+                    raise RuntimeError(f"health check returned {r.status_code}")
+            except Exception as e:
+                # Probes only count towards ejection, not request errors
+                self.mark_failure(node, e, count_error=False)
+            else:
+                self.mark_success(node)
+
+        await asyncio.gather(*(probe(n) for n in self.nodes))
+
+    def stats(self) -> list:
+        return [n.stats() for n in self.nodes]
+
+
+def _urls(env_name: str) -> list[str]:
+    return [u.strip() for u in (os.getenv(env_name) or "").split(",") if u.strip()]
+
+
+backend_pools = {
+    "transcribe": BackendPool("transcribe", _urls("TRANSCRIBE_API")),
+    "diarize": BackendPool("diarize", _urls("DIARIZE_API"))
+}
+
+_health_task = None
+
+
+async def _health_loop(get_client):
+    while True:
+        await asyncio.sleep(BACKEND_HEALTH_INTERVAL)
+        for name, pool in backend_pools.items():
+            try:
+                await pool.check(get_client(name))
+            except Exception as e:
+                print(f"❌ Backend health check error ({name}): {e}")
+
+
+def start_health_checks(get_client):
+    global _health_task
+    if _health_task is None and BACKEND_HEALTH_INTERVAL > 0:
+        _health_task = asyncio.create_task(_health_loop(get_client))
+
+
+async def stop_health_checks():
+    global _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        await asyncio.gather(_health_task, return_exceptions=True)
+        _health_task = None
+
+
+def backend_node_stats() -> dict:
+    return {name: pool.stats() for name, pool in backend_pools.items()}
@@ -0,0 +1,205 @@
+import asyncio
+import math
+import os
+import wave
+from tempfile import SpooledTemporaryFile
+
+import numpy as np
+from starlette.datastructures import UploadFile
+
+# =====================================================
+# CHUNKED PROCESSING OF LONG WAV UPLOADS
+# =====================================================
+# POST /upload?chunked=true splits PCM WAV input into chunks of about
+# CHUNK_SECONDS, cut at the quietest block within CHUNK_SEARCH_SEC of each
+# target boundary, and extended by CHUNK_OVERLAP_SEC on both sides. Chunks go
+# to the backend concurrently; their segments are shifted back to absolute
+# time and each segment is kept only by the chunk that owns its midpoint,
+# which drops the duplicates transcribed twice in the overlap.
+#
+# Only the search windows are decoded for the energy scan, and each chunk is
+# written to its own spooled file right before it is sent.
+
+CHUNK_SECONDS = float(os.getenv("CHUNK_SECONDS", "300"))
+CHUNK_OVERLAP_SEC = float(os.getenv("CHUNK_OVERLAP_SEC", "2"))
+CHUNK_SEARCH_SEC = float(os.getenv("CHUNK_SEARCH_SEC", "10"))
+CHUNK_ENERGY_BLOCK_MS = int(os.getenv("CHUNK_ENERGY_BLOCK_MS", "50"))
+# Chunks of one upload in flight at once (the backend limiter still applies)
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))
+
+_SAMPLE_DTYPES = {1: np.uint8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+_COPY_FRAMES = 1 << 18
+
+
+def wav_params(fileobj):
+    """(channels, sampwidth, framerate, nframes) of a PCM WAV file, or None."""
+    fileobj.seek(0)
+    try:
+        with wave.open(fileobj, "rb") as wav:
+            params = wav.getparams()
+    except (wave.Error, EOFError):
+        return None
+    finally:
+        fileobj.seek(0)
+
+    if not params.framerate:
+        return None
+    return params.nchannels, params.sampwidth, params.framerate, params.nframes
+
+
+def _block_energy(frames: bytes, sampwidth: int, channels: int, block: int) -> np.ndarray:
+    """Mean-square energy of consecutive `block`-frame blocks."""
+    samples = np.frombuffer(frames, dtype=_SAMPLE_DTYPES[sampwidth]).astype(np.float32)
+    if sampwidth == 1:
+        samples -= 128.0
+
+    n_blocks = len(samples) // (block * channels)
+    blocks = samples[:n_blocks * block * channels].reshape(n_blocks, block * channels)
+    return np.square(blocks).mean(axis=1)
+
+
+def _plan_cuts(fileobj, params) -> list[int]:
+    channels, sampwidth, rate, nframes = params
+    chunk = int(CHUNK_SECONDS * rate)
+    search = min(int(CHUNK_SEARCH_SEC * rate), chunk // 4)
+    block = max(1, int(rate * CHUNK_ENERGY_BLOCK_MS / 1000))
+
+    cuts = [0]
+    fileobj.seek(0)
+    with wave.open(fileobj, "rb") as wav:
+        while nframes - cuts[-1] > chunk + search:
+            target = cuts[-1] + chunk
+            lo, hi = target - search, min(nframes, target + search)
+            wav.setpos(lo)
+            energy = _block_energy(wav.readframes(hi - lo), sampwidth, channels, block)
+
+            if len(energy):
+                cuts.append(lo + int(np.argmin(energy)) * block + block // 2)
+            else:
+                cuts.append(target)
+    fileobj.seek(0)
+
+    cuts.append(nframes)
+    return cuts
+
+
+def plan_chunks(fileobj):
+    """
+    Split plan for a PCM WAV upload: a list of dicts with the frame range
+    to send (start/end, including overlap) and the time range whose segments
+    the chunk owns (own_start/own_end, seconds). None when the upload is not
+    a supported WAV or is short enough to go as a single request.
+    """
+    params = wav_params(fileobj)
+    if params is None or params[1] not in _SAMPLE_DTYPES:
+        return None
+
+    _, _, rate, nframes = params
+    cuts = _plan_cuts(fileobj, params)
+    if len(cuts) <= 2:
+        return None
+
+    overlap = int(CHUNK_OVERLAP_SEC * rate)
+    chunks = []
+    for i in range(len(cuts) - 1):
+        chunks.append({
+            "index": i,
+            "start": max(0, cuts[i] - overlap),
+            "end": min(nframes, cuts[i + 1] + overlap),
+            "own_start": cuts[i] / rate if i else -math.inf,
+            "own_end": cuts[i + 1] / rate if i < len(cuts) - 2 else math.inf,
+            "offset": max(0, cuts[i] - overlap) / rate
+        })
+    return {"params": params, "chunks": chunks}
+
+
+def _write_chunk(fileobj, params, chunk: dict):
+    channels, sampwidth, rate, _ = params
+    out = SpooledTemporaryFile(max_size=1024 * 1024)
+
+    fileobj.seek(0)
+    with wave.open(fileobj, "rb") as src, wave.open(out, "wb") as dst:
+        dst.setnchannels(channels)
+        dst.setsampwidth(sampwidth)
+        dst.setframerate(rate)
+
+        src.setpos(chunk["start"])
+        remaining = chunk["end"] - chunk["start"]
+        while remaining > 0:
+            n = min(remaining, _COPY_FRAMES)
+            dst.writeframes(src.readframes(n))
+            remaining -= n
+
+    size = out.tell()
+    out.seek(0)
+    return out, size
+
+
+def _shift(item: dict, offset: float) -> dict:
+    item = dict(item)
+    for key in ("start", "end"):
+        if isinstance(item.get(key), (int, float)):
+            item[key] = round(item[key] + offset, 3)
+    if isinstance(item.get("words"), list):
+        item["words"] = [
+            _shift(w, offset) if isinstance(w, dict) else w
+            for w in item["words"]
+        ]
+    return item
+
+
+def merge_results(parts: list) -> dict:
+    """Merge [(chunk, result), ...] into one result on the original timeline."""
+    segments = []
+    for chunk, result in parts:
+        for seg in (result or {}).get("segments") or []:
+            if not isinstance(seg, dict):
+                continue
+            seg = _shift(seg, chunk["offset"])
+            start, end = seg.get("start", 0), seg.get("end", seg.get("start", 0))
+            if chunk["own_start"] <= (start + end) / 2 < chunk["own_end"]:
+                segments.append(seg)
+    segments.sort(key=lambda s: s.get("start", 0))
+
+    merged = {**(parts[0][1] or {}), "segments": segments}
+    if isinstance(merged.get("text"), str):
+        merged["text"] = " ".join(
+            s["text"].strip() for s in segments if isinstance(s.get("text"), str)
+        )
+    return merged
+
+
+async def process_chunked(upload, plan: dict, send) -> dict:
+    """
+    Send each chunk of `plan` through `send(chunk_upload, seconds)` (at most
+    CHUNK_CONCURRENCY at a time) and return the merged result.
+    """
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+    # Chunks are cut from the one shared source file handle
+    read_lock = asyncio.Lock()
+    stem = os.path.splitext(upload.filename or "audio")[0]
+    rate = plan["params"][2]
+
+    async def run(chunk):
+        async with semaphore:
+            async with read_lock:
+                out, size = await asyncio.to_thread(
+                    _write_chunk, upload.file, plan["params"], chunk
+                )
+            try:
+                part = UploadFile(out, size=size, filename=f"{stem}.part{chunk['index']}.wav")
+                seconds = (chunk["end"] - chunk["start"]) / rate
+                return chunk, await send(part, seconds)
+            finally:
+                out.close()
+
+    tasks = [asyncio.ensure_future(run(c)) for c in plan["chunks"]]
+    try:
+        parts = await asyncio.gather(*tasks)
+    except BaseException:
+        # One failed chunk fails the upload; don't keep the others running
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return merge_results(list(parts))
@@ -0,0 +1,149 @@
+import asyncio
+import gzip
+import json
+import os
+from collections import OrderedDict
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# =====================================================
+# CACHED, COMPRESSED RESULT RESPONSES
+# =====================================================
+# GET /transcription/{id} answers with a strong ETag ("<id>-v<version>").
+# Transcription records are written with version 1 and anything that
+# changes a stored record increments it. Clients revalidate on every use
+# (Cache-Control no-cache); a matching If-None-Match gets a 304 after a
+# metadata-only lookup. Full responses are compressed (br when the client
+# accepts it, else gzip); bodies above RESPONSE_COMPRESS_MIN_BYTES are kept
+# pre-compressed in a byte-bounded LRU keyed by ETag and encoding.
+
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+
+RESULT_CACHE_CONTROL = "private, no-cache"
+
+
+class CompressedResponseCache:
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # (etag, encoding) -> body
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        body = self._entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= len(self._entries.pop(key))
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+response_cache = CompressedResponseCache()
+
+
+def make_etag(record_id, version=1) -> str:
+    return f'"{record_id}-v{version}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in (accept_encoding or "").split(",")
+        if not part.strip().endswith(";q=0")
+    }
+    if "br" in accepted and brotli is not None:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _encode(payload) -> bytes:
+    # Same serialization as FastAPI's JSONResponse
+    return json.dumps(
+        jsonable_encoder(payload),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": RESULT_CACHE_CONTROL}
+    )
+
+
+async def versioned_json(payload_fn, etag: str, accept_encoding: str) -> Response:
+    """
+    JSON response for a resource identified by a versioned ETag.
+    `payload_fn` is an async callable producing the payload; it is skipped
+    when a pre-compressed body for this ETag is cached.
+    """
+    encoding = choose_encoding(accept_encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": RESULT_CACHE_CONTROL,
+        "Vary": "Accept-Encoding"
+    }
+
+    if encoding:
+        body = response_cache.get((etag, encoding))
+        if body is not None:
+            headers["Content-Encoding"] = encoding
+            return Response(body, media_type="application/json", headers=headers)
+
+    body = await asyncio.to_thread(_encode, await payload_fn())
+    if encoding and len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+        body = await asyncio.to_thread(_compress, body, encoding)
+        response_cache.put((etag, encoding), body)
+        headers["Content-Encoding"] = encoding
+
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,102 @@
+import httpx
+import os
+
+# =====================================================
+# SHARED BACKEND HTTP CLIENTS
+# =====================================================
+# One AsyncClient per backend (transcribe / diarize) for the lifetime of the
+# app, so uploads reuse keep-alive connections instead of paying a fresh TCP
+# (and TLS) handshake every time. HTTP/2 is negotiated via ALPN, so it is only
+# used against https backends that offer it; plain http stays on HTTP/1.1.
+
+BACKENDS = ("transcribe", "diarize")
+
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "32"))
+BACKEND_MAX_KEEPALIVE = int(os.getenv("BACKEND_MAX_KEEPALIVE", "16"))
+BACKEND_KEEPALIVE_EXPIRY = float(os.getenv("BACKEND_KEEPALIVE_EXPIRY", "60"))
+BACKEND_HTTP2 = os.getenv("BACKEND_HTTP2", "1") == "1"
+
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "10"))
+# Long files are processed synchronously by the backend, so the read timeout
+# has to cover the whole processing time (gunicorn itself allows 1200s).
+BACKEND_READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "1100"))
+BACKEND_WRITE_TIMEOUT = float(os.getenv("BACKEND_WRITE_TIMEOUT", "120"))
+BACKEND_POOL_TIMEOUT = float(os.getenv("BACKEND_POOL_TIMEOUT", "30"))
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=BACKEND_HTTP2,
+        limits=httpx.Limits(
+            max_connections=BACKEND_MAX_CONNECTIONS,
+            max_keepalive_connections=BACKEND_MAX_KEEPALIVE,
+            keepalive_expiry=BACKEND_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            connect=BACKEND_CONNECT_TIMEOUT,
+            read=BACKEND_READ_TIMEOUT,
+            write=BACKEND_WRITE_TIMEOUT,
+            pool=BACKEND_POOL_TIMEOUT
+        )
+    )
+
+
+def start_clients():
+    for name in BACKENDS:
+        if name not in _clients:
+            _clients[name] = _build_client()
+
+
+async def close_clients():
+    for name in list(_clients):
+        await _clients.pop(name).aclose()
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the shared client for a backend, creating it on first use."""
+    client = _clients.get(name)
+    if client is None:
+        client = _clients[name] = _build_client()
+    return client
+
+
+def _pool_counts(client):
+    """
+    (in_use, idle, waiters) of a client's connection pool. httpcore does not
+    expose pool counters publicly, so this reads its internal state; None
+    when that state is not there (another httpcore version or transport).
+    """
+    if client is None:
+        return 0, 0, 0
+    try:
+        pool = client._transport._pool
+        connections = list(pool.connections)
+        idle = sum(1 for c in connections if c.is_idle())
+        waiters = sum(1 for r in list(pool._requests) if r.is_queued())
+    except (AttributeError, TypeError):
+        return None
+    return len(connections) - idle, idle, waiters
+
+
+def pool_stats() -> dict:
+    """
+    Connection pool usage per backend: connections in use, idle
+    keep-alive connections and requests waiting for a connection.
+    The counters are null (and "available" false) when the pool state
+    cannot be read.
+    """
+    stats = {}
+    for name in BACKENDS:
+        counts = _pool_counts(_clients.get(name))
+        in_use, idle, waiters = counts if counts is not None else (None, None, None)
+        stats[name] = {
+            "available": counts is not None,
+            "in_use": in_use,
+            "idle": idle,
+            "waiters": waiters,
+            "max_connections": BACKEND_MAX_CONNECTIONS,
+            "http2": BACKEND_HTTP2
+        }
+    return stats
@@ -0,0 +1,252 @@
+import asyncio
+import os
+import shutil
+import uuid
+from time import time
+
+from starlette.datastructures import UploadFile
+
+from auth.auth_utils import async_redis_client
+from auth.mongo import run_in_db
+from auth.principal_cache import load_principal
+from app_logger.logger import log_event
+from gateway.quota import refund_upload
+from gateway.limiter import BackendOverloaded
+
+# =====================================================
+# ASYNC UPLOAD JOBS
+# =====================================================
+# POST /upload?async=true spools the audio to the data volume, records a job
+# hash in Redis and pushes its id on a list; gateway-side workers pop ids
+# with BLMOVE into a processing list and run the normal upload pipeline.
+# Both the job state and the audio live outside the process, so queued and
+# interrupted jobs are picked up again after a restart.
+#
+# Recovery moves everything in the processing list back to the queue, which
+# assumes a single gateway worker process (as in the Dockerfile).
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_DATA_DIR = os.getenv("JOB_DATA_DIR", "/app/data/jobs")
+JOB_TTL_SEC = int(os.getenv("JOB_TTL_SEC", str(7 * 24 * 3600)))
+
+QUEUE_KEY = "upload_jobs:queue"
+PROCESSING_KEY = "upload_jobs:processing"
+
+_workers: list[asyncio.Task] = []
+
+
+def _job_key(job_id: str) -> str:
+    return f"upload_job:{job_id}"
+
+
+def _spool_to_disk(fileobj, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fileobj.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(fileobj, out, 1024 * 1024)
+
+
+# ---------------------------
+# SUBMIT / STATUS
+# ---------------------------
+
+async def submit_job(
+    principal: dict,
+    upload,
+    mode: str,
+    reservation: dict,
+    chunked: bool = False
+) -> dict:
+    job_id = uuid.uuid4().hex
+    path = os.path.join(JOB_DATA_DIR, job_id)
+    await asyncio.to_thread(_spool_to_disk, upload.file, path)
+
+    job = {
+        "job_id": job_id,
+        "status": "queued",
+        "user_id": principal["user_id"],
+        "username": principal["username"],
+        "mode": mode,
+        "chunked": int(chunked),
+        "filename": upload.filename or "",
+        "file_size": upload.size or os.path.getsize(path),
+        "path": path,
+        "quota_member": reservation.get("member") or "",
+        "quota_limit": reservation["limit"],
+        "created_at": int(time())
+    }
+
+    pipe = async_redis_client.pipeline(transaction=True)
+    pipe.hset(_job_key(job_id), mapping=job)
+    pipe.lpush(QUEUE_KEY, job_id)
+    await pipe.execute()
+
+    log_event("logs_api", {
+        "event": "upload_job_queued",
+        "job_id": job_id,
+        "user_id": principal["user_id"],
+        "filename": upload.filename,
+        "mode": mode,
+        "timestamp": int(time())
+    })
+    return job
+
+
+async def get_job(job_id: str):
+    job = await async_redis_client.hgetall(_job_key(job_id))
+    return job or None
+
+
+async def queue_depth() -> dict:
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.llen(QUEUE_KEY)
+    pipe.llen(PROCESSING_KEY)
+    queued, processing = await pipe.execute()
+    return {
+        "workers": JOB_WORKERS,
+        "queued": queued,
+        "processing": processing
+    }
+
+
+# ---------------------------
+# WORKERS
+# ---------------------------
+
+async def _finish(job_id: str, path: str, fields: dict):
+    pipe = async_redis_client.pipeline(transaction=True)
+    pipe.hset(_job_key(job_id), mapping={**fields, "finished_at": int(time())})
+    pipe.expire(_job_key(job_id), JOB_TTL_SEC)
+    pipe.lrem(PROCESSING_KEY, 0, job_id)
+    await pipe.execute()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def _run_job(job_id: str, processor):
+    job = await get_job(job_id)
+    if not job:
+        await async_redis_client.lrem(PROCESSING_KEY, 0, job_id)
+        return
+
+    await async_redis_client.hset(
+        _job_key(job_id),
+        mapping={"status": "running", "started_at": int(time())}
+    )
+
+    upload = None
+    try:
+        principal = await run_in_db(load_principal, job["user_id"])
+        if not principal:
+            raise RuntimeError("User no longer exists")
+
+        upload = UploadFile(
+            open(job["path"], "rb"),
+            size=int(job["file_size"]),
+            filename=job["filename"]
+        )
+        _, record = await processor(
+            principal, upload, job["mode"], chunked=job.get("chunked") == "1"
+        )
+
+    except BackendOverloaded as e:
+        # Not a failure: put the job back at the head of the queue and let
+        # this worker back off before taking more work
+        pipe = async_redis_client.pipeline(transaction=True)
+        pipe.hset(_job_key(job_id), "status", "queued")
+        pipe.lrem(PROCESSING_KEY, 0, job_id)
+        pipe.rpush(QUEUE_KEY, job_id)
+        await pipe.execute()
+        await asyncio.sleep(e.retry_after)
+        return
+
+    except Exception as e:
+        # Same contract as the synchronous path: failed uploads are refunded
+        await refund_upload(job["user_id"], {
+            "member": job.get("quota_member"),
+            "limit": int(job.get("quota_limit", 0)),
+            "remaining": 0
+        })
+        log_event("logs_api", {
+            "event": "upload_job_failed",
+            "job_id": job_id,
+            "user_id": job["user_id"],
+            "filename": job["filename"],
+            "mode": job["mode"],
+            "error": str(e),
+            "timestamp": int(time())
+        })
+        await _finish(job_id, job["path"], {"status": "failed", "error": str(e)})
+        return
+
+    finally:
+        if upload is not None:
+            upload.file.close()
+
+    log_event("logs_api", {
+        "event": "upload_job_completed",
+        "job_id": job_id,
+        "user_id": job["user_id"],
+        "transcription_id": str(record["_id"]),
+        "timestamp": int(time())
+    })
+    await _finish(job_id, job["path"], {
+        "status": "done",
+        "transcription_id": str(record["_id"])
+    })
+
+
+async def _worker(processor):
+    while True:
+        try:
+            job_id = await async_redis_client.blmove(
+                QUEUE_KEY, PROCESSING_KEY, 1, "RIGHT", "LEFT"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Upload job queue error: {e}")
+            await asyncio.sleep(2)
+            continue
+
+        if job_id:
+            # Cancellation (shutdown) leaves the id in the processing list,
+            # so the job is re-queued on the next start
+            await _run_job(job_id, processor)
+
+
+async def requeue_interrupted():
+    """Move jobs that were running when the gateway stopped back to the queue."""
+    moved = 0
+    while True:
+        job_id = await async_redis_client.lmove(PROCESSING_KEY, QUEUE_KEY, "RIGHT", "RIGHT")
+        if not job_id:
+            break
+        await async_redis_client.hset(_job_key(job_id), "status", "queued")
+        moved += 1
+    if moved:
+        log_event("logs_api", {
+            "event": "upload_jobs_requeued",
+            "count": moved,
+            "timestamp": int(time())
+        })
+
+
+async def start_job_workers(processor):
+    """processor(principal, upload, mode, chunked) -> (result, transcription_record)"""
+    try:
+        await requeue_interrupted()
+    except Exception as e:
+        print(f"❌ Upload job recovery error: {e}")
+
+    for _ in range(JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(processor)))
+
+
+async def stop_job_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
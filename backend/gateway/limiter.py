@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+# =====================================================
+# BACKEND CONCURRENCY LIMITER
+# =====================================================
+# Bounds how many requests are in flight to each backend. Requests beyond
+# the limit wait in a bounded queue for up to BACKEND_QUEUE_TIMEOUT;
+# when the queue is full (or the wait times out) the caller gets
+# BackendOverloaded right away, which the API maps to 429 + Retry-After,
+# instead of piling more work onto the GPU service.
+#
+# The queue is shortest-first: waiters are ordered by their cost (probed
+# audio seconds) minus BACKEND_QUEUE_AGING seconds of credit per second of
+# arrival time, so long files still move up behind a stream of short ones.
+# Equal keys (e.g. unknown cost) are served FIFO.
+
+BACKEND_MAX_CONCURRENCY = int(os.getenv("BACKEND_MAX_CONCURRENCY", "4"))
+BACKEND_MAX_QUEUE = int(os.getenv("BACKEND_MAX_QUEUE", "32"))
+BACKEND_QUEUE_TIMEOUT = float(os.getenv("BACKEND_QUEUE_TIMEOUT", "60"))
+BACKEND_QUEUE_AGING = float(os.getenv("BACKEND_QUEUE_AGING", "10"))
+
+
+class BackendOverloaded(Exception):
+    def __init__(self, backend: str, reason: str, retry_after: int):
+        super().__init__(f"{backend} backend overloaded ({reason})")
+        self.backend = backend
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class BackendLimiter:
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = BACKEND_MAX_CONCURRENCY,
+        max_queue: int = BACKEND_MAX_QUEUE,
+        queue_timeout: float = BACKEND_QUEUE_TIMEOUT
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self._waiters = []  # heap of (key, seq, future)
+        self._seq = itertools.count()
+        # Moving average of backend call duration, for Retry-After hints
+        self._avg_service_sec = 10.0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_service_sec * backlog / self.max_concurrency))
+
+    async def acquire(self, cost: float = 0.0):
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise BackendOverloaded(self.name, "queue_full", self.retry_after())
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        entry = ((cost or 0.0) - BACKEND_QUEUE_AGING * loop.time(), next(self._seq), waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            # Same race as below: on 3.12+ wait_for can time out after
+            # release() already handed this waiter the slot
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            self.timed_out += 1
+            raise BackendOverloaded(self.name, "queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+        self.admitted += 1
+
+    def release(self):
+        # Hand the slot straight to the cheapest live waiter (in_flight unchanged)
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 0.0):
+        await self.acquire(cost)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._avg_service_sec = 0.8 * self._avg_service_sec + 0.2 * elapsed
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout_sec": self.queue_timeout,
+            "avg_service_sec": round(self._avg_service_sec, 2),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+
+def _limiter(name: str) -> BackendLimiter:
+    # Per-backend overrides, e.g. DIARIZE_MAX_CONCURRENCY=2
+    prefix = name.upper()
+    return BackendLimiter(
+        name,
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", BACKEND_MAX_CONCURRENCY)),
+        max_queue=int(os.getenv(f"{prefix}_MAX_QUEUE", BACKEND_MAX_QUEUE)),
+        queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", BACKEND_QUEUE_TIMEOUT))
+    )
+
+
+limiters = {
+    "transcribe": _limiter("transcribe"),
+    "diarize": _limiter("diarize")
+}
+
+
+def limiter_stats() -> dict:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
@@ -0,0 +1,281 @@
+import asyncio
+import os
+from time import time
+
+from bson import ObjectId
+
+from auth.mongo import (
+    api_keys_collection,
+    app_log_collection,
+    events_collection,
+    purge_jobs_collection,
+    run_in_db,
+    transcriptions_collection,
+    usage_collection,
+    users_collection
+)
+from auth.auth_utils import destroy_user_sessions, redis_client
+from auth.principal_cache import invalidate_user
+from app_logger.logger import log_event
+from gateway.quota import window_key
+from gateway.result_store import release_blob
+
+# =====================================================
+# BACKGROUND USER PURGE
+# =====================================================
+# DELETE /admin/users/{id} records a job in the purge_jobs collection and
+# returns; a single background task works through the jobs. Each job runs
+# a fixed list of steps, access first (sessions, Redis keys, API keys, the
+# user document) so nothing new is written for the user while the bulk
+# data goes. Bulk steps delete at most PURGE_BATCH_SIZE documents per round
+# trip, selected through an index on user_id, and record progress after
+# every batch.
+#
+# Every step is idempotent and the job document remembers the current
+# step, so a job interrupted by a restart simply resumes there on the next
+# start. Like the upload job queue, this assumes one gateway process.
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+# Pause between batches, to keep a large purge from crowding out live traffic
+PURGE_BATCH_PAUSE_MS = int(os.getenv("PURGE_BATCH_PAUSE_MS", "50"))
+
+_queue: asyncio.Queue = None
+_worker: asyncio.Task = None
+
+
+# ---------------------------
+# STEPS
+# ---------------------------
+# Access steps delete everything in one go; bulk steps return the number
+# of documents removed by one batch (0 = step finished).
+
+def _purge_redis(user_id: str) -> int:
+    destroy_user_sessions(user_id)
+    return redis_client.delete(window_key(user_id), f"stats:{user_id}")
+
+
+def _purge_api_keys(user_id: str) -> int:
+    deleted = api_keys_collection.delete_many({"user_id": user_id}).deleted_count
+    invalidate_user(user_id)
+    return deleted
+
+
+def _purge_user(user_id: str) -> int:
+    deleted = users_collection.delete_one({"_id": ObjectId(user_id)}).deleted_count
+    invalidate_user(user_id)
+    return deleted
+
+
+def _purge_transcriptions_batch(user_id: str) -> int:
+    batch = list(transcriptions_collection.find(
+        {"user_id": user_id},
+        {"_id": 1, "result_ref": 1},
+        limit=PURGE_BATCH_SIZE
+    ))
+    # Blobs first: a crash in between leaves records that are retried,
+    # never records pointing at nothing. Blobs shared with records outside
+    # the batch (result cache) go with the last of them.
+    ids = [record["_id"] for record in batch]
+    for ref in {record["result_ref"] for record in batch if record.get("result_ref") is not None}:
+        release_blob(ref, ids)
+    return _delete_ids(transcriptions_collection, batch)
+
+
+def _purge_usage_batch(user_id: str) -> int:
+    # granularity is part of the filter so the rollup key index applies
+    return _delete_batch(usage_collection, {
+        "user_id": user_id,
+        "granularity": {"$exists": True}
+    })
+
+
+def _purge_logs_batch(user_id: str) -> int:
+    # The pre-time-series App.log too, until it has been migrated and dropped
+    query = {"data.user_id": user_id}
+    return _delete_batch(events_collection, query) or _delete_batch(app_log_collection, query)
+
+
+def _delete_batch(collection, query: dict) -> int:
+    batch = list(collection.find(query, {"_id": 1}, limit=PURGE_BATCH_SIZE))
+    return _delete_ids(collection, batch)
+
+
+def _delete_ids(collection, batch: list) -> int:
+    if not batch:
+        return 0
+    return collection.delete_many(
+        {"_id": {"$in": [doc["_id"] for doc in batch]}}
+    ).deleted_count
+
+
+# (name, function, batched)
+STEPS = [
+    ("redis", _purge_redis, False),
+    ("api_keys", _purge_api_keys, False),
+    ("user", _purge_user, False),
+    ("transcriptions", _purge_transcriptions_batch, True),
+    ("usage", _purge_usage_batch, True),
+    ("logs", _purge_logs_batch, True)
+]
+STEP_NAMES = [name for name, _, _ in STEPS]
+
+
+# ---------------------------
+# JOB STATE
+# ---------------------------
+
+def _create_job(user: dict, admin: dict) -> dict:
+    user_id = str(user["_id"])
+    # One purge per user at a time
+    existing = purge_jobs_collection.find_one(
+        {"user_id": user_id, "status": {"$in": ["queued", "running"]}}
+    )
+    if existing:
+        return existing
+
+    job = {
+        "user_id": user_id,
+        "username": user.get("username"),
+        "admin_user_id": admin["_id"],
+        "status": "queued",
+        "step": STEP_NAMES[0],
+        "deleted": {name: 0 for name in STEP_NAMES},
+        "batches": 0,
+        "created_at": int(time()),
+        "updated_at": int(time())
+    }
+    job["_id"] = purge_jobs_collection.insert_one(job).inserted_id
+    return job
+
+
+def _update_job(job_id, fields: dict, inc: dict = None):
+    update = {"$set": {**fields, "updated_at": int(time())}}
+    if inc:
+        update["$inc"] = inc
+    purge_jobs_collection.update_one({"_id": job_id}, update)
+
+
+def job_view(job: dict) -> dict:
+    return {
+        "job_id": str(job["_id"]),
+        "user_id": job["user_id"],
+        "username": job.get("username"),
+        "status": job["status"],
+        "step": job.get("step"),
+        "steps": STEP_NAMES,
+        "deleted": job.get("deleted", {}),
+        "batches": job.get("batches", 0),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+        "finished_at": job.get("finished_at")
+    }
+
+
+async def submit_purge(user: dict, admin: dict) -> dict:
+    job = await run_in_db(_create_job, user, admin)
+    if job["status"] == "queued" and _queue is not None:
+        _queue.put_nowait(job["_id"])
+    return job
+
+
+async def get_purge_job(job_id: str):
+    try:
+        oid = ObjectId(job_id)
+    except Exception:
+        return None
+    return await run_in_db(purge_jobs_collection.find_one, {"_id": oid})
+
+
+# ---------------------------
+# WORKER
+# ---------------------------
+
+async def _run_purge(job_id):
+    job = await run_in_db(purge_jobs_collection.find_one, {"_id": job_id})
+    if not job or job["status"] not in ("queued", "running"):
+        return
+    user_id = job["user_id"]
+
+    await run_in_db(_update_job, job_id, {"status": "running"})
+    log_event("logs_auth", {
+        "event": "user_purge_started",
+        "job_id": str(job_id),
+        "target_user_id": user_id,
+        "resumed_at_step": job["step"],
+        "timestamp": int(time())
+    })
+
+    try:
+        for name, fn, batched in STEPS[STEP_NAMES.index(job["step"]):]:
+            await run_in_db(_update_job, job_id, {"step": name})
+            while True:
+                deleted = await run_in_db(fn, user_id)
+                await run_in_db(
+                    _update_job, job_id, {},
+                    {f"deleted.{name}": deleted, "batches": 1}
+                )
+                if not batched or deleted == 0:
+                    break
+                await asyncio.sleep(PURGE_BATCH_PAUSE_MS / 1000)
+
+    except asyncio.CancelledError:
+        raise  # shutdown: resumed from the current step on the next start
+
+    except Exception as e:
+        await run_in_db(_update_job, job_id, {"status": "failed", "error": str(e)})
+        log_event("logs_auth", {
+            "event": "user_purge_failed",
+            "job_id": str(job_id),
+            "target_user_id": user_id,
+            "error": str(e),
+            "timestamp": int(time())
+        })
+        return
+
+    await run_in_db(_update_job, job_id, {"status": "done", "finished_at": int(time())})
+    job = await run_in_db(purge_jobs_collection.find_one, {"_id": job_id})
+    log_event("logs_auth", {
+        "event": "user_purge_completed",
+        "job_id": str(job_id),
+        "target_user_id": user_id,
+        "deleted": job.get("deleted"),
+        "timestamp": int(time())
+    })
+
+
+async def _work():
+    while True:
+        job_id = await _queue.get()
+        try:
+            await _run_purge(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ User purge error: {e}")
+
+
+async def start_purge_worker():
+    """Start the worker and re-queue jobs left unfinished by the last run."""
+    global _queue, _worker
+    _queue = asyncio.Queue()
+    try:
+        pending = await run_in_db(lambda: list(purge_jobs_collection.find(
+            {"status": {"$in": ["queued", "running"]}},
+            {"_id": 1},
+            sort=[("created_at", 1)]
+        )))
+    except Exception as e:
+        print(f"❌ User purge recovery error: {e}")
+        pending = []
+    for job in pending:
+        _queue.put_nowait(job["_id"])
+    _worker = asyncio.create_task(_work())
+
+
+async def stop_purge_worker():
+    global _worker
+    if _worker is not None:
+        _worker.cancel()
+        await asyncio.gather(_worker, return_exceptions=True)
+        _worker = None
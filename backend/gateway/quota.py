@@ -0,0 +1,85 @@
+import os
+import time
+import uuid
+
+from auth.auth_utils import async_redis_client
+
+# =====================================================
+# SLIDING-WINDOW UPLOAD QUOTA
+# =====================================================
+# A slot is reserved atomically before the upload is processed (one Redis
+# round trip), so concurrent uploads can no longer all pass a GET-then-INCR
+# check. Each reservation is a member of a per-user sorted set scored by its
+# timestamp; the window slides instead of resetting on a fixed TTL. A failed
+# upload refunds its slot.
+
+UPLOAD_WINDOW_SEC = int(os.getenv("UPLOAD_WINDOW_SEC", "3600"))
+
+# KEYS[1] = window key
+# ARGV    = now_ms, window_ms, limit, member
+_RESERVE_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    count = count + 1
+    allowed = 1
+end
+redis.call('PEXPIRE', KEYS[1], window)
+
+local reset_ms = 0
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset_ms = tonumber(oldest[2]) + window - now
+end
+return {allowed, count, reset_ms}
+"""
+
+_reserve_script = async_redis_client.register_script(_RESERVE_LUA)
+
+
+def window_key(user_id: str) -> str:
+    return f"upload_window:{user_id}"
+
+
+async def reserve_upload(user_id: str, limit: int) -> dict:
+    """
+    Try to take one upload slot in the user's sliding window.
+
+    Returns a reservation dict: allowed, member (pass to refund_upload),
+    count (slots used including this one), limit, remaining, reset_sec.
+    """
+    member = uuid.uuid4().hex
+    allowed, count, reset_ms = await _reserve_script(
+        keys=[window_key(user_id)],
+        args=[int(time.time() * 1000), UPLOAD_WINDOW_SEC * 1000, limit, member]
+    )
+    return {
+        "allowed": bool(allowed),
+        "member": member if allowed else None,
+        "count": int(count),
+        "limit": limit,
+        "remaining": max(0, limit - int(count)),
+        "reset_sec": max(0, -(-int(reset_ms) // 1000))
+    }
+
+
+async def refund_upload(user_id: str, reservation: dict):
+    if reservation and reservation.get("member"):
+        await async_redis_client.zrem(window_key(user_id), reservation["member"])
+        reservation["member"] = None
+        reservation["remaining"] = min(reservation["limit"], reservation["remaining"] + 1)
+
+
+def quota_headers(reservation: dict) -> dict:
+    return {
+        "X-RateLimit-Limit": str(reservation["limit"]),
+        "X-RateLimit-Remaining": str(reservation["remaining"]),
+        "X-RateLimit-Reset": str(reservation["reset_sec"]),
+        "X-RateLimit-Window": str(UPLOAD_WINDOW_SEC)
+    }
@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import os
+
+from auth.mongo import async_transcriptions_collection
+from gateway.result_store import STORAGE_FIELDS, load_result, stored_fields
+
+# =====================================================
+# CONTENT-ADDRESSED RESULT CACHE
+# =====================================================
+# Re-uploads of the same recording are answered from an earlier
+# transcription instead of going back to the GPU backend. The key is
+# sha256(mode + audio bytes), stored as "content_hash" on transcription
+# records. Identical uploads that arrive while the first one is still being
+# processed wait for that single backend call instead of making their own.
+# Either way the new record reuses the stored result (inline or blob) of
+# the record it was answered from rather than writing another copy.
+#
+# Both the lookup and the in-flight coalescing are scoped to the uploading
+# user: a hit (or its timing) must never reveal that someone else has
+# uploaded the same audio.
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") == "1"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_inflight: dict[tuple, asyncio.Future] = {}
+
+stats = {
+    "hits": 0,
+    "misses": 0,
+    "coalesced": 0
+}
+
+
+def _hash_file(fileobj, mode: str) -> str:
+    digest = hashlib.sha256(mode.encode() + b"\0")
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(HASH_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+async def hash_upload(upload, mode: str) -> str:
+    """
+    Content hash of a spooled UploadFile, computed chunk by chunk in a
+    worker thread so large files neither sit in memory nor block the loop.
+    """
+    return await asyncio.to_thread(_hash_file, upload.file, mode)
+
+
+async def lookup(user_id: str, content_hash: str):
+    """(result, storage fields) of the user's latest record for the hash, or None."""
+    record = await async_transcriptions_collection.find_one(
+        {"user_id": user_id, "content_hash": content_hash},
+        STORAGE_FIELDS,
+        sort=[("created_at", -1)]
+    )
+    if not record:
+        return None
+    return await load_result(record), stored_fields(record)
+
+
+async def get_or_compute(user_id: str, content_hash: str, compute):
+    """
+    Return ((result, storage fields), source) where source is "cache",
+    "coalesced" or "backend". `compute` returns (result, storage fields)
+    too; it is only awaited when neither a stored result nor an in-flight
+    computation for the same user and hash exists.
+    """
+    key = (user_id, content_hash)
+    cached = await lookup(user_id, content_hash)
+    if cached is not None:
+        stats["hits"] += 1
+        return cached, "cache"
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        stats["coalesced"] += 1
+        return await asyncio.shield(pending), "coalesced"
+
+    stats["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await compute()
+        future.set_result(result)
+        return result, "backend"
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark as retrieved: nobody may be waiting on it
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+def cache_stats() -> dict:
+    return {
+        **stats,
+        "enabled": RESULT_CACHE_ENABLED,
+        "inflight": len(_inflight)
+    }
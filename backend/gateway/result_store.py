@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+
+import gridfs
+
+from auth.mongo import db, run_in_db, transcriptions_collection
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+# =====================================================
+# OUT-OF-LINE STORAGE FOR LARGE RESULTS
+# =====================================================
+# Results whose JSON encoding is above RESULT_INLINE_MAX_BYTES are stored
+# compressed in the "results" GridFS bucket; the transcription record keeps
+# only result_ref (the GridFS file id) plus encoding and sizes. Everything
+# that reads a result goes through load_result(), which handles both forms.
+#
+# Records answered from the result cache point at the blob of the record
+# they were answered from instead of storing another copy, so a blob is
+# only deleted once no record references it (release_blob).
+
+RESULT_INLINE_MAX_BYTES = int(os.getenv("RESULT_INLINE_MAX_BYTES", str(256 * 1024)))
+# zstd when the zstandard package is installed, otherwise gzip
+RESULT_COMPRESSION = os.getenv("RESULT_COMPRESSION", "zstd" if zstandard else "gzip")
+
+results_bucket = gridfs.GridFSBucket(db, bucket_name="results")
+
+RESULT_FIELDS = {"result": 1, "result_ref": 1, "result_encoding": 1}
+STORAGE_FIELDS = {**RESULT_FIELDS, "result_size": 1, "result_stored_size": 1}
+_STORAGE_NAMES = tuple(STORAGE_FIELDS)
+
+
+def compress(raw: bytes):
+    """(encoding, compressed bytes) for an encoded result."""
+    if RESULT_COMPRESSION == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(raw)
+    return "gzip", gzip.compress(raw, compresslevel=6)
+
+
+def _decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed results")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def encode_result(result) -> bytes:
+    return json.dumps(result, separators=(",", ":"), default=str).encode()
+
+
+def put_blob(raw: bytes, filename: str = "result.json") -> dict:
+    """Compress and upload an encoded result; returns the record fields."""
+    encoding, data = compress(raw)
+    file_id = results_bucket.upload_from_stream(
+        filename,
+        data,
+        metadata={"encoding": encoding, "raw_size": len(raw)}
+    )
+    return {
+        "result_ref": file_id,
+        "result_encoding": encoding,
+        "result_size": len(raw),
+        "result_stored_size": len(data)
+    }
+
+
+def _store_sync(result, filename: str) -> dict:
+    raw = encode_result(result)
+    if len(raw) <= RESULT_INLINE_MAX_BYTES:
+        return {"result": result}
+    return put_blob(raw, filename)
+
+
+def _load_sync(record: dict):
+    data = results_bucket.open_download_stream(record["result_ref"]).read()
+    return json.loads(_decompress(data, record.get("result_encoding", "gzip")))
+
+
+async def store_result(result, filename: str = "result.json") -> dict:
+    """
+    Fields to put on a transcription record for `result`: the result itself
+    when small, otherwise a reference to its compressed blob.
+    """
+    return await run_in_db(_store_sync, result, filename)
+
+
+def stored_fields(record: dict) -> dict:
+    """The storage fields of a record, to point another record at the same result."""
+    return {field: record[field] for field in _STORAGE_NAMES if field in record}
+
+
+async def discard_result(fields: dict):
+    """Undo store_result for a record that was never inserted."""
+    if fields.get("result_ref") is not None:
+        await run_in_db(release_blob, fields["result_ref"])
+
+
+async def load_result(record: dict):
+    """The result of a transcription record, wherever it is stored."""
+    if record.get("result_ref") is None:
+        return record.get("result")
+    return await run_in_db(_load_sync, record)
+
+
+def delete_blob(file_id):
+    try:
+        results_bucket.delete(file_id)
+    except gridfs.errors.NoFile:
+        pass
+
+
+def release_blob(file_id, exclude_ids=()) -> bool:
+    """
+    Delete a blob unless a transcription record still references it;
+    records in `exclude_ids` (about to be deleted) don't count.
+    """
+    query = {"result_ref": file_id}
+    if exclude_ids:
+        query["_id"] = {"$nin": list(exclude_ids)}
+    if transcriptions_collection.find_one(query, {"_id": 1}) is not None:
+        return False
+    delete_blob(file_id)
+    return True
@@ -0,0 +1,61 @@
+import mimetypes
+import os
+import secrets
+
+# =====================================================
+# STREAMING UPLOAD PROXY
+# =====================================================
+# Instead of `await file.read()` (whole file in gateway RAM), the upload is
+# re-sent to the backend as a multipart body produced chunk by chunk from the
+# spooled UploadFile. Peak memory per upload is bounded by the chunk size.
+
+UPLOAD_STREAMING = os.getenv("UPLOAD_STREAMING", "1") == "1"
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+
+def _quote_filename(filename: str) -> str:
+    # Same escaping httpx applies to multipart filenames
+    return (
+        filename.replace("\\", "\\\\")
+        .replace('"', "%22")
+        .replace("\r", "")
+        .replace("\n", "")
+    )
+
+
+def multipart_upload(upload, field: str = "file", chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """
+    Build a streamed multipart/form-data body for an UploadFile.
+
+    Returns (headers, body) where body is an async iterator of bytes, ready
+    for `client.post(url, content=body, headers=headers)`. Content-Length is
+    set when the upload size is known so the backend does not have to deal
+    with chunked transfer encoding.
+    """
+    filename = upload.filename or "upload"
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    boundary = secrets.token_hex(16)
+
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; '
+        f'filename="{_quote_filename(filename)}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    async def body():
+        await upload.seek(0)
+        yield head
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield tail
+
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    if upload.size is not None:
+        headers["Content-Length"] = str(len(head) + upload.size + len(tail))
+
+    return headers, body()
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+from auth.mongo import async_usage_collection
+from app_logger.logger import log_event
+
+# =====================================================
+# USAGE ROLLUPS
+# =====================================================
+# Every finished (or failed) upload increments two documents in the usage
+# collection: its hour bucket and its day bucket, keyed by
+# (user_id, granularity, bucket, mode). Both upserts go out in one
+# bulk_write. /admin/usage reads only these rollups, never transcriptions
+# or the logs; the number of documents it touches is bounded by
+# users x modes x buckets in the requested range.
+
+GRANULARITIES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1)
+}
+
+METRICS = ("files", "audio_sec", "processing_sec", "bytes", "failures")
+
+
+def bucket_start(ts: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+async def record_usage(
+    user_id: str,
+    mode: str,
+    audio_sec: float = 0,
+    processing_sec: float = 0,
+    size: int = 0,
+    failed: bool = False,
+    at: datetime = None
+):
+    """Add one upload to the user's hourly and daily rollups."""
+    at = at or datetime.utcnow()
+    inc = {
+        "files": 0 if failed else 1,
+        "audio_sec": round(audio_sec or 0, 3),
+        "processing_sec": round(processing_sec or 0, 3),
+        "bytes": size or 0,
+        "failures": 1 if failed else 0
+    }
+    ops = [
+        UpdateOne(
+            {
+                "user_id": user_id,
+                "granularity": granularity,
+                "bucket": bucket_start(at, granularity),
+                "mode": mode
+            },
+            {"$inc": inc, "$set": {"updated_at": at}},
+            upsert=True
+        )
+        for granularity in GRANULARITIES
+    ]
+    try:
+        await async_usage_collection.bulk_write(ops, ordered=False)
+    except Exception as e:
+        # Analytics must never fail an upload
+        log_event("logs_usage", {
+            "event": "usage_rollup_failed",
+            "user_id": user_id,
+            "mode": mode,
+            "error": str(e)
+        })
+
+
+async def usage_series(
+    granularity: str,
+    start: datetime,
+    end: datetime,
+    user_id: str = None,
+    mode: str = None
+) -> list:
+    """
+    Totals per bucket in [start, end), each with a per-mode breakdown.
+    Buckets without any usage are included with zeros. A start inside a
+    bucket includes that whole bucket.
+    """
+    start = bucket_start(start, granularity)
+    match = {"granularity": granularity, "bucket": {"$gte": start, "$lt": end}}
+    if user_id:
+        match["user_id"] = user_id
+    if mode:
+        match["mode"] = mode
+
+    rows = await async_usage_collection.aggregate_list([
+        {"$match": match},
+        {"$group": {
+            "_id": {"bucket": "$bucket", "mode": "$mode"},
+            **{m: {"$sum": f"${m}"} for m in METRICS}
+        }}
+    ])
+
+    by_bucket = {}
+    for row in rows:
+        totals = {m: row[m] for m in METRICS}
+        by_bucket.setdefault(row["_id"]["bucket"], {})[row["_id"]["mode"]] = totals
+
+    step = GRANULARITIES[granularity]
+    series = []
+    bucket = start
+    while bucket < end:
+        modes = by_bucket.get(bucket, {})
+        point = {"timestamp": int(bucket.replace(tzinfo=timezone.utc).timestamp())}
+        for m in METRICS:
+            point[m] = sum(t[m] for t in modes.values())
+        point["audio_sec"] = round(point["audio_sec"], 3)
+        point["processing_sec"] = round(point["processing_sec"], 3)
+        point["modes"] = modes
+        series.append(point)
+        bucket += step
+    return series
@@ -0,0 +1,197 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+import websockets
+from websockets.protocol import State
+
+# =====================================================
+# PRE-WARMED BACKEND WEBSOCKETS FOR /ws/diarize
+# =====================================================
+# Each diarize node keeps a few backend sockets already through their
+# handshake. A new live session takes one (a "hit") instead of connecting
+# after the browser has been accepted; on a miss it connects directly as
+# before. A socket carries one session's backend state, so it is handed out
+# once and never returned to the pool.
+#
+# The pool size floats between WS_POOL_MIN and WS_POOL_MAX: every miss
+# grows the target by one, every socket closed for sitting idle longer
+# than WS_POOL_IDLE_TIMEOUT shrinks it by one. A background task refills
+# the pool after each handoff and pings idle sockets every
+# WS_POOL_CHECK_INTERVAL, discarding the ones that do not answer.
+
+WS_POOL_MIN = int(os.getenv("WS_POOL_MIN", "2"))
+WS_POOL_MAX = int(os.getenv("WS_POOL_MAX", "8"))
+WS_POOL_IDLE_TIMEOUT = float(os.getenv("WS_POOL_IDLE_TIMEOUT", "120"))
+WS_POOL_CHECK_INTERVAL = float(os.getenv("WS_POOL_CHECK_INTERVAL", "15"))
+WS_POOL_CONNECT_TIMEOUT = float(os.getenv("WS_POOL_CONNECT_TIMEOUT", "10"))
+WS_POOL_PING_TIMEOUT = float(os.getenv("WS_POOL_PING_TIMEOUT", "5"))
+
+
+async def _connect(url: str):
+    return await websockets.connect(url, max_size=None, open_timeout=WS_POOL_CONNECT_TIMEOUT)
+
+
+async def _close_quietly(conn):
+    try:
+        await conn.close()
+    except Exception:
+        pass
+
+
+class WarmSocketPool:
+    def __init__(
+        self,
+        url: str,
+        min_size: int = WS_POOL_MIN,
+        max_size: int = WS_POOL_MAX,
+        idle_timeout: float = WS_POOL_IDLE_TIMEOUT
+    ):
+        self.url = url
+        self.min_size = min_size
+        self.max_size = max(min_size, max_size)
+        self.idle_timeout = idle_timeout
+        self.target = min_size
+
+        self._idle = deque()  # (conn, opened_at)
+        self._wake = asyncio.Event()
+        self._task = None
+
+        self.hits = 0
+        self.misses = 0
+        self.opened = 0
+        self.expired = 0
+        self.unhealthy = 0
+        self.connect_errors = 0
+        self.last_error = None
+
+    async def acquire(self):
+        """Return (backend socket, prewarmed)."""
+        while self._idle:
+            conn, _ = self._idle.popleft()
+            if conn.state is State.OPEN:
+                self.hits += 1
+                self._wake.set()
+                return conn, True
+            self.unhealthy += 1
+
+        self.misses += 1
+        if self.target < self.max_size:
+            self.target += 1
+        self._wake.set()
+        return await _connect(self.url), False
+
+    async def _fill(self):
+        while len(self._idle) < self.target:
+            try:
+                conn = await _connect(self.url)
+            except Exception as e:
+                # Retried on the next check; the node's health is tracked
+                # by the backend pool
+                self.connect_errors += 1
+                self.last_error = str(e) or type(e).__name__
+                return
+            self.opened += 1
+            self._idle.append((conn, time.monotonic()))
+
+    def _discard(self, entry):
+        try:
+            self._idle.remove(entry)
+        except ValueError:
+            return False  # handed out meanwhile
+        asyncio.ensure_future(_close_quietly(entry[0]))
+        return True
+
+    async def _check(self):
+        now = time.monotonic()
+        for entry in list(self._idle):
+            conn, opened_at = entry
+            if now - opened_at > self.idle_timeout:
+                if self._discard(entry):
+                    self.expired += 1
+                    self.target = max(self.min_size, self.target - 1)
+                continue
+
+            try:
+                pong = await conn.ping()
+                await asyncio.wait_for(pong, WS_POOL_PING_TIMEOUT)
+            except Exception:
+                if self._discard(entry):
+                    self.unhealthy += 1
+
+    async def _run(self):
+        last_check = time.monotonic()
+        while True:
+            await self._fill()
+            try:
+                await asyncio.wait_for(self._wake.wait(), WS_POOL_CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            if time.monotonic() - last_check >= WS_POOL_CHECK_INTERVAL:
+                await self._check()
+                last_check = time.monotonic()
+
+    def start(self):
+        if self._task is None and self.min_size > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._idle:
+            conn, _ = self._idle.popleft()
+            await _close_quietly(conn)
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "target": self.target,
+            "min": self.min_size,
+            "max": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "opened": self.opened,
+            "expired": self.expired,
+            "unhealthy": self.unhealthy,
+            "connect_errors": self.connect_errors,
+            "last_error": self.last_error
+        }
+
+
+# One pool per backend WS URL (i.e. per diarize node)
+ws_pools: dict[str, WarmSocketPool] = {}
+
+
+def start_ws_pools(urls):
+    if WS_POOL_MIN <= 0:
+        return
+    for url in urls:
+        if url not in ws_pools:
+            ws_pools[url] = WarmSocketPool(url)
+            ws_pools[url].start()
+
+
+async def stop_ws_pools():
+    await asyncio.gather(*(pool.close() for pool in ws_pools.values()))
+    ws_pools.clear()
+
+
+async def acquire_backend_ws(url: str):
+    """(socket, prewarmed) for `url`, from its pool when there is one."""
+    pool = ws_pools.get(url)
+    if pool is None:
+        return await websockets.connect(url, max_size=None), False
+    return await pool.acquire()
+
+
+def ws_pool_stats() -> dict:
+    # The URL carries the internal API key; report pools by host instead
+    return {
+        url.split("://", 1)[-1].split("/", 1)[0]: pool.stats()
+        for url, pool in ws_pools.items()
+    }
@@ -0,0 +1,184 @@
+import asyncio
+import os
+
+import numpy as np
+from fastapi import WebSocketDisconnect
+from websockets.exceptions import ConnectionClosed
+
+# =====================================================
+# FULL-DUPLEX LIVE DIARIZATION RELAY
+# =====================================================
+# Browser -> backend and backend -> browser run as independent tasks joined
+# by bounded queues, so a slow backend reply no longer stops audio
+# ingestion:
+#
+#   browser --reader--> [upstream q] --writer--> backend
+#   browser <--writer-- [downstream q] <--reader-- backend
+#
+# Upstream full (backend not keeping up):
+#   block        stop reading from the browser (TCP backpressure), default
+#   drop_oldest  discard the oldest queued audio frame
+# Downstream full (browser not reading results):
+#   drop_oldest  discard the oldest queued result, default
+#   close        end the session
+#
+# The relay ends as soon as any of the four tasks finishes; the others are
+# cancelled.
+#
+# Coalescing: the backend writer batches queued frames into one message for
+# up to WS_COALESCE_MS after the first frame, or until WS_COALESCE_BYTES are
+# collected (with only a byte limit it merges whatever is already queued,
+# without waiting). Frames are concatenated as-is, which is valid for both a
+# raw PCM stream and MediaRecorder chunks.
+#
+# Silence gate (PCM16 little-endian streams only): frames whose RMS is below
+# WS_SILENCE_RMS are dropped before they reach the GPU service.
+
+WS_UPSTREAM_QUEUE = int(os.getenv("WS_UPSTREAM_QUEUE", "64"))
+WS_DOWNSTREAM_QUEUE = int(os.getenv("WS_DOWNSTREAM_QUEUE", "64"))
+WS_UPSTREAM_POLICY = os.getenv("WS_UPSTREAM_POLICY", "block")
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+
+WS_COALESCE_MS = float(os.getenv("WS_COALESCE_MS", "0"))
+WS_COALESCE_BYTES = int(os.getenv("WS_COALESCE_BYTES", "0"))
+WS_SILENCE_GATE = os.getenv("WS_SILENCE_GATE", "0") == "1"
+WS_SILENCE_RMS = float(os.getenv("WS_SILENCE_RMS", "200"))
+
+
+class SlowConsumer(Exception):
+    pass
+
+
+def is_silent(frame: bytes, threshold: float = WS_SILENCE_RMS) -> bool:
+    """RMS of a PCM16 little-endian frame below `threshold`."""
+    samples = np.frombuffer(frame, dtype="<i2", count=len(frame) // 2)
+    if not len(samples):
+        return True
+    samples = samples.astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) < threshold
+
+
+def _put_drop_oldest(queue: asyncio.Queue, item) -> bool:
+    """Enqueue without waiting; returns True when an older item was dropped."""
+    dropped = False
+    if queue.full():
+        queue.get_nowait()
+        dropped = True
+    queue.put_nowait(item)
+    return dropped
+
+
+async def relay(
+    ws,
+    backend_ws,
+    upstream_policy: str = WS_UPSTREAM_POLICY,
+    slow_consumer_policy: str = WS_SLOW_CONSUMER_POLICY,
+    coalesce_ms: float = WS_COALESCE_MS,
+    coalesce_bytes: int = WS_COALESCE_BYTES,
+    silence_gate: bool = WS_SILENCE_GATE
+):
+    """
+    Pump audio frames from the browser socket `ws` to `backend_ws` and
+    results back until either side closes.
+
+    Returns (reason, stats) with the session counters; unexpected errors
+    propagate.
+    """
+    upstream = asyncio.Queue(WS_UPSTREAM_QUEUE)
+    downstream = asyncio.Queue(WS_DOWNSTREAM_QUEUE)
+    stats = {
+        "frames_received": 0,
+        "frames_gated": 0,
+        "frames_dropped": 0,
+        "frames_forwarded": 0,
+        "messages_sent": 0,
+        "bytes_received": 0,
+        "bytes_saved": 0,
+        "results_received": 0,
+        "results_forwarded": 0,
+        "results_dropped": 0
+    }
+
+    async def browser_reader():
+        while True:
+            data = await ws.receive_bytes()
+            stats["frames_received"] += 1
+            stats["bytes_received"] += len(data)
+            if silence_gate and is_silent(data):
+                stats["frames_gated"] += 1
+                stats["bytes_saved"] += len(data)
+                continue
+            if upstream_policy == "drop_oldest":
+                stats["frames_dropped"] += _put_drop_oldest(upstream, data)
+            else:
+                await upstream.put(data)
+
+    async def next_batch() -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await upstream.get()]
+        size = len(batch[0])
+        deadline = loop.time() + coalesce_ms / 1000
+
+        while not coalesce_bytes or size < coalesce_bytes:
+            if upstream.empty():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    data = await asyncio.wait_for(upstream.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                data = upstream.get_nowait()
+            batch.append(data)
+            size += len(data)
+        return batch
+
+    async def backend_writer():
+        coalescing = coalesce_ms > 0 or coalesce_bytes > 0
+        while True:
+            if coalescing:
+                batch = await next_batch()
+                await backend_ws.send(b"".join(batch))
+            else:
+                batch = [await upstream.get()]
+                await backend_ws.send(batch[0])
+            stats["frames_forwarded"] += len(batch)
+            stats["messages_sent"] += 1
+
+    async def backend_reader():
+        async for result in backend_ws:
+            stats["results_received"] += 1
+            if slow_consumer_policy == "close" and downstream.full():
+                raise SlowConsumer("client is not reading results")
+            stats["results_dropped"] += _put_drop_oldest(downstream, result)
+
+    async def browser_writer():
+        while True:
+            result = await downstream.get()
+            if isinstance(result, bytes):
+                result = result.decode()
+            # Backend results are already JSON text; forward as-is
+            await ws.send_text(result)
+            stats["results_forwarded"] += 1
+
+    tasks = {
+        asyncio.ensure_future(browser_reader()): "client_disconnected",
+        asyncio.ensure_future(backend_writer()): "backend_closed",
+        asyncio.ensure_future(backend_reader()): "backend_closed",
+        asyncio.ensure_future(browser_writer()): "client_disconnected"
+    }
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    finished = done.pop()
+    error = finished.exception()
+    if error is None or isinstance(error, (WebSocketDisconnect, ConnectionClosed)):
+        return tasks[finished], stats
+    if isinstance(error, SlowConsumer):
+        return "slow_consumer", stats
+    raise error
@@ -1,16 +1,134 @@
-from auth.mongo import client, db, transcriptions_collection
+"""
+Database setup: reconciles MongoDB indexes with INDEX_SPEC (auth/mongo.py).
+
+Usage (from backend/):
+    python init_db.py            # create missing indexes, report drift
+    python init_db.py check      # report only, change nothing
+    python init_db.py explain    # query plans of the hot queries
+"""
+from auth.mongo import client, db, COLLECTION_SPEC, INDEX_SPEC, ensure_collection
+from bson import ObjectId
 from datetime import datetime
-import os
+import argparse
 import time
 
+INDEX_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _key(keys) -> tuple:
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in keys)
+
+
+def _option(index: dict, name: str):
+    # unique/sparse: False and absent mean the same
+    value = index.get(name)
+    return None if value is False else value
+
+
+def _describe(keys) -> str:
+    return ", ".join(f"{field} {direction}" for field, direction in keys)
+
+
+def reconcile_indexes(create: bool = True) -> dict:
+    """
+    Compare collections and their indexes with COLLECTION_SPEC / INDEX_SPEC.
+    Missing ones are created and TTLs brought in line (unless create=False);
+    indexes with other differing options and indexes not in the spec are
+    reported, never changed or dropped.
+    """
+    report = {"created": [], "updated": [], "missing": [], "drifted": [], "unexpected": []}
+
+    for name, options in COLLECTION_SPEC.items():
+        if not create:
+            if name not in db.list_collection_names(filter={"name": name}):
+                report["missing"].append(f"collection {name}")
+            continue
+        if ensure_collection(name):
+            report["created"].append(f"collection {name}")
+            continue
+        # Collection-wide expiry follows the spec (e.g. a changed retention)
+        info = db.command("listCollections", filter={"name": name})["cursor"]["firstBatch"]
+        current = info[0].get("options", {}).get("expireAfterSeconds") if info else None
+        if "expireAfterSeconds" in options and current != options["expireAfterSeconds"]:
+            db.command("collMod", name, expireAfterSeconds=options["expireAfterSeconds"])
+            report["updated"].append(
+                f"collection {name} expireAfterSeconds {current} -> {options['expireAfterSeconds']}"
+            )
+
+    for name, specs in INDEX_SPEC.items():
+        collection = db[name]
+        indexes = collection.index_information()
+        indexes.pop("_id_", None)
+        by_key = {_key(info["key"]): index_name for index_name, info in indexes.items()}
+
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            label = f"{name} ({_describe(spec['keys'])})" + (f" [{spec['name']}]" if "name" in spec else "")
+            # Named indexes (several on the same keys, e.g. per-category
+            # TTLs) are matched by name, the rest by key pattern
+            index_name = spec.get("name") or by_key.get(_key(spec["keys"]))
+
+            if index_name not in indexes:
+                if create:
+                    collection.create_index(spec["keys"], **options)
+                    report["created"].append(label)
+                else:
+                    report["missing"].append(label)
+                continue
+
+            info = indexes.pop(index_name)
+            if "name" not in spec:
+                label += f" [{index_name}]"
+            diffs = [
+                opt for opt in INDEX_OPTIONS
+                if _option(options, opt) != _option(info, opt)
+            ]
+            if create and diffs == ["expireAfterSeconds"] and info.get("expireAfterSeconds") is not None:
+                # Only the TTL differs; collMod changes it in place
+                db.command("collMod", name, index={
+                    "name": index_name,
+                    "expireAfterSeconds": options["expireAfterSeconds"]
+                })
+                report["updated"].append(
+                    f"{label} expireAfterSeconds "
+                    f"{info['expireAfterSeconds']} -> {options['expireAfterSeconds']}"
+                )
+            elif diffs:
+                report["drifted"].append(f"{label}: " + "; ".join(
+                    f"{opt}: expected {_option(options, opt)!r}, found {_option(info, opt)!r}"
+                    for opt in diffs
+                ))
+
+        for index_name, info in indexes.items():
+            report["unexpected"].append(f"{name} ({_describe(info['key'])}) [{index_name}]")
+
+    return report
+
+
+def print_report(report: dict):
+    for label in report["created"]:
+        print(f"Created {label}" if label.startswith("collection ") else f"Created index on {label}")
+    for line in report["updated"]:
+        print(f"Updated {line}")
+    for label in report["missing"]:
+        print(f"⚠️ Missing index: {label}")
+    for line in report["drifted"]:
+        print(f"⚠️ Index drift: {line}")
+    for label in report["unexpected"]:
+        print(f"⚠️ Index not in INDEX_SPEC: {label}")
+    if not any(report.values()):
+        print("All indexes match INDEX_SPEC")
+
+
 def init_database():
     """Initialize the database with required indexes"""
     print("Initializing database...")
-    
+
     # Test MongoDB connection first
     max_retries = 5
     retry_delay = 2
-    
+
     for attempt in range(max_retries):
         try:
             # Test the connection
@@ -23,32 +141,120 @@ def init_database():
                 print("Could not connect to MongoDB after several attempts. Skipping index creation.")
                 return
             time.sleep(retry_delay)
-    
-    # Check if indexes already exist by checking if the collection has any indexes
-    # (other than the default _id index)
+
+    # Runs on every start, so indexes added to the spec in later releases
+    # get created on existing deployments too
     try:
-        indexes = transcriptions_collection.index_information()
-        if len(indexes) > 1:  # More than just the default _id index
-            print("Indexes already exist, skipping initialization")
-            return
-        
-        print("Creating MongoDB indexes...")
-        
-        # Create index on user_id for faster queries
-        transcriptions_collection.create_index("user_id")
-        print("Created index on user_id")
-        
-        # Create index on created_at for sorting
-        transcriptions_collection.create_index([("created_at", -1)])
-        print("Created index on created_at (descending)")
-        
-        # Create compound index for user_id and created_at for efficient history queries
-        transcriptions_collection.create_index([("user_id", 1), ("created_at", -1)])
-        print("Created compound index on (user_id, created_at)")
-        
+        print("Reconciling MongoDB indexes...")
+        print_report(reconcile_indexes(create=True))
         print("Database initialization completed successfully!")
     except Exception as e:
         print(f"Error during database initialization: {e}")
 
+
+# =====================================================
+# HOT QUERY PLANS
+# =====================================================
+# The queries on the request path, in the shape the code sends them (with
+# placeholder values). `explain` prints the winning plan of each so a
+# collection scan or an in-memory (blocking) SORT shows up in review.
+_OID = ObjectId("000000000000000000000000")
+_UID = str(_OID)
+
+HOT_QUERIES = [
+    ("login / register", "users",
+     {"$or": [{"email": "x"}, {"username": "x"}]}, None),
+    ("principal: user", "users", {"_id": _OID}, None),
+    ("principal: api key by hash", "api_keys", {"key_hash": "x"}, None),
+    ("principal: api key by user", "api_keys", {"user_id": _UID}, None),
+    ("admin users: page", "users", {}, [("username", 1), ("_id", 1)]),
+    ("admin users: prefix search", "users",
+     {"$or": [{"username": {"$regex": "^x"}}, {"email": {"$regex": "^x"}}]},
+     [("username", 1), ("_id", 1)]),
+    ("history: page", "transcriptions",
+     {"user_id": _UID, "created_at": {"$lt": datetime(2100, 1, 1)}},
+     [("created_at", -1), ("_id", -1)]),
+    ("history: by mode", "transcriptions",
+     {"user_id": _UID, "mode": "transcribe"}, [("created_at", -1), ("_id", -1)]),
+    ("history: filename prefix", "transcriptions",
+     {"user_id": _UID, "filename": {"$regex": "^x"}}, [("created_at", -1), ("_id", -1)]),
+    ("history: mode + prefix", "transcriptions",
+     {"user_id": _UID, "mode": "transcribe", "filename": {"$regex": "^x"}},
+     [("created_at", -1), ("_id", -1)]),
+    ("history: next page, prefix", "transcriptions",
+     {"$and": [
+         {"user_id": _UID, "filename": {"$regex": "^x"}},
+         {"$or": [{"created_at": {"$lt": datetime(2100, 1, 1)}},
+                  {"created_at": datetime(2100, 1, 1), "_id": {"$lt": _OID}}]}
+     ]},
+     [("created_at", -1), ("_id", -1)]),
+    ("result cache lookup", "transcriptions",
+     {"user_id": _UID, "content_hash": "x"}, [("created_at", -1)]),
+    ("usage: rollup upsert", "usage",
+     {"user_id": _UID, "granularity": "hour", "bucket": datetime(2000, 1, 1), "mode": "transcribe"}, None),
+    ("usage: series", "usage",
+     {"granularity": "hour", "bucket": {"$gte": datetime(2000, 1, 1), "$lt": datetime(2100, 1, 1)}}, None),
+    ("purge: transcriptions", "transcriptions", {"user_id": _UID}, None),
+    ("purge: shared blob check", "transcriptions",
+     {"result_ref": _OID, "_id": {"$nin": [_OID]}}, None),
+    ("purge: usage", "usage", {"user_id": _UID, "granularity": {"$exists": True}}, None),
+    ("purge: logs", "app_events", {"data.user_id": _UID}, None),
+    ("purge: pending jobs", "purge_jobs",
+     {"status": {"$in": ["queued", "running"]}}, [("created_at", 1)]),
+    ("logs by request", "app_events", {"data.request_id": "x"}, None),
+    ("logs by event", "app_events",
+     {"meta.collection": "logs_api", "meta.event": "upload_completed"}, [("timestamp", -1)]),
+]
+
+
+def _plan_stages(plan: dict) -> list:
+    stages = []
+    while plan:
+        stage = plan.get("stage")
+        if stage == "IXSCAN":
+            stage = f"IXSCAN {plan.get('indexName')}"
+        stages.append(stage)
+        for child in plan.get("inputStages", []):
+            stages.extend(_plan_stages(child))
+        plan = plan.get("inputStage")
+    return stages
+
+
+def explain_hot_queries():
+    scans = sorts = 0
+    for label, name, query, sort in HOT_QUERIES:
+        cursor = db[name].find(query).limit(50)
+        if sort:
+            cursor = cursor.sort(sort)
+        explained = cursor.explain()
+
+        planner = explained.get("queryPlanner", {})
+        winning = planner.get("winningPlan", {})
+        # Newer servers nest the classic plan under queryPlan
+        stages = _plan_stages(winning.get("queryPlan", winning))
+        examined = explained.get("executionStats", {}).get("totalDocsExamined")
+
+        flag = "⚠️ " if "COLLSCAN" in stages or "SORT" in stages else "   "
+        scans += "COLLSCAN" in stages
+        sorts += "SORT" in stages
+        print(f"{flag}{label:<30} {name:<15} {' <- '.join(stages)}"
+              + (f"  (docs examined: {examined})" if examined is not None else ""))
+
+    print(f"\n{len(HOT_QUERIES)} queries, {scans} collection scan(s), {sorts} in-memory sort(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", nargs="?", default="init", choices=["init", "check", "explain"])
+    args = parser.parse_args()
+
+    if args.command == "init":
+        init_database()
+    elif args.command == "check":
+        print_report(reconcile_indexes(create=False))
+    else:
+        explain_hot_queries()
+
+
 if __name__ == "__main__":
-    init_database()
\ No newline at end of file
+    main()
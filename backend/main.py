@@ -3,31 +3,82 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi import WebSocketDisconnect
 from pathlib import Path
 from fastapi.responses import JSONResponse
+from fastapi import Response
 from auth.auth_routes import router as auth_router
 from fastapi import Request
 from time import time
 from app_logger.logger import log_event
 from auth.mongo import db
-from datetime import datetime
+from datetime import datetime, timedelta
+from bson import ObjectId
 
 
-from auth.auth_utils import get_current_user, redis_client
-from auth.mongo import users_collection, transcriptions_collection
+from auth.mongo import (
+    async_api_keys_collection,
+    async_transcriptions_collection
+)
 from fastapi import Depends, HTTPException
-from auth.mongo import api_keys_collection
-from auth.api_key_utils import verify_api_key, hash_api_key
+from auth.api_key_utils import verify_api_key
+from auth.principal_cache import (
+    resolve_session,
+    resolve_api_key,
+    start_invalidation_listener,
+    stop_invalidation_listener
+)
 
 from auth.admin_routes import router as admin_router
+from gateway.http_clients import start_clients, close_clients, get_client
+from gateway.streaming import UPLOAD_STREAMING, multipart_upload
+from app_logger.mongo_sink import log_sink
+from gateway.quota import reserve_upload, refund_upload, quota_headers
+from gateway.result_cache import RESULT_CACHE_ENABLED, hash_upload, get_or_compute
+from gateway.jobs import submit_job, get_job, start_job_workers, stop_job_workers
+from gateway.limiter import limiters, BackendOverloaded
+from gateway.chunking import plan_chunks, process_chunked
+from gateway.audio_probe import probe_duration, max_audio_duration
+from gateway.ws_relay import relay
+from gateway.ws_pool import start_ws_pools, stop_ws_pools, acquire_backend_ws
+from gateway.result_store import RESULT_FIELDS, store_result, load_result, discard_result
+from gateway.http_cache import make_etag, etag_matches, not_modified, versioned_json
+from gateway.usage import record_usage
+from gateway.purge import start_purge_worker, stop_purge_worker
+from gateway.backend_pool import (
+    BACKEND_RETRIES,
+    BackendNodeError,
+    backend_pools,
+    start_health_checks,
+    stop_health_checks
+)
 
-import httpx
-import websockets
+from contextlib import asynccontextmanager
 import asyncio
-import json
+import base64
+import httpx
+import re
 import os
 
-TRANSCRIBE_API = os.getenv("TRANSCRIBE_API")
-DIARIZE_API    =  os.getenv("DIARIZE_API")
-app = FastAPI(title="Audio Gateway API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared, pooled clients for the transcription / diarization backends
+    start_clients()
+    start_health_checks(get_client)
+    start_ws_pools([diarize_ws_url(n.url) for n in backend_pools["diarize"].nodes])
+    log_sink.start()
+    start_invalidation_listener()
+    await start_job_workers(process_upload)
+    await start_purge_worker()
+    yield
+    await stop_purge_worker()
+    await stop_job_workers()
+    stop_invalidation_listener()
+    await stop_health_checks()
+    await stop_ws_pools()
+    await close_clients()
+    # Flush buffered log events before the worker exits
+    await asyncio.to_thread(log_sink.stop)
+
+
+app = FastAPI(title="Audio Gateway API", lifespan=lifespan)
 
 # Initialize database indexes on startup
 from init_db import init_database
@@ -51,6 +102,10 @@ app.include_router(admin_router)
 
 API_KEY = os.getenv("API_KEY")
 
+
+def diarize_ws_url(node_url: str) -> str:
+    return f"{node_url.replace('http', 'ws')}/ws/diarize?api_key={API_KEY}"
+
 #-----------------------------
 #---ALLOWED ORIGINS--------
 #--------------------------
@@ -82,36 +137,283 @@ app.add_middleware(
 # FILE UPLOAD ENDPOINT
 # -------------------------
 # Authentication dependency that accepts either session or API key
-def get_user_id(
+# NOTE: kept as a plain `def` on purpose — FastAPI runs sync dependencies in
+# its threadpool, so the blocking Redis / pymongo lookups on a principal
+# cache miss never touch the event loop.
+def get_principal(
     session_id: str = Cookie(None),
     x_api_key: str = Header(None)
 ):
     # 1️⃣ Try session-based auth (browser)
     if session_id:
-        user_id = get_current_user(session_id)
-        if user_id:
-            return user_id
+        principal = resolve_session(session_id)
+        if principal:
+            return principal
 
     # 2️⃣ Fallback to API key auth (Swagger / CLI)
     if x_api_key:
-        api_key_doc = api_keys_collection.find_one({
-            "key_hash": hash_api_key(x_api_key),
-            "active": True
-        })
-        if api_key_doc:
-            return api_key_doc["user_id"]
+        principal = resolve_api_key(x_api_key)
+        if principal and principal["api_key_active"]:
+            return principal
 
     raise HTTPException(401, "Authentication required")
 
 
+def get_user_id(principal: dict = Depends(get_principal)):
+    return principal["user_id"]
+
+
+
+async def _post_to_node(client, url: str, file: UploadFile, headers: dict):
+    if UPLOAD_STREAMING:
+        # Pipe the spooled upload to the backend chunk by chunk; the body
+        # generator rewinds the file, so a retry re-streams it from the start
+        stream_headers, body = multipart_upload(file)
+        return await client.post(
+            url,
+            content=body,
+            headers={**headers, **stream_headers}
+        )
+
+    await file.seek(0)
+    file_content = await file.read()
+    files = {"file": (file.filename, file_content)}
+    return await client.post(url, files=files, headers=headers)
+
+
+async def call_backend(
+    mode: str,
+    file: UploadFile,
+    user_id: str,
+    username: str,
+    cost: float = 0.0
+):
+    """
+    Send an upload to the transcription / diarization backend and return its
+    JSON. `cost` (audio seconds) orders the wait for a backend slot.
+    """
+    headers = {"x-api-key": API_KEY}
+    client = get_client(mode)
+    pool = backend_pools[mode]
+
+    # Bounded in-flight requests per backend; raises BackendOverloaded
+    async with limiters[mode].slot(cost):
+        tried = set()
+        while True:
+            node = pool.pick(exclude=tried)
+            tried.add(node.url)
+
+            log_event("logs_api", {
+                "event": "calling_internal_service",
+                "user_id": user_id,
+                "username": username,
+                "filename": file.filename,
+                "mode": mode,
+                "service_url": node.url,
+                "streaming": UPLOAD_STREAMING,
+                "timestamp": int(time())
+            })
+
+            try:
+                async with pool.track(node):
+                    r = await _post_to_node(client, node.url, file, headers)
+                    if r.status_code >= 500:
+                        raise BackendNodeError(r)
+            except BackendNodeError as e:
+                r = e.response
+                break
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Nothing reached the node, so it is safe to try another one
+                if len(tried) > BACKEND_RETRIES or len(tried) >= len(pool.nodes):
+                    raise
+                log_event("logs_api", {
+                    "event": "internal_service_retry",
+                    "user_id": user_id,
+                    "filename": file.filename,
+                    "mode": mode,
+                    "service_url": node.url,
+                    "error": str(e) or type(e).__name__,
+                    "timestamp": int(time())
+                })
+                continue
+            break
+
+    if r.status_code != 200:
+        log_event("logs_api", {
+            "event": "internal_service_error",
+            "user_id": user_id,
+            "username": username,
+            "filename": file.filename,
+            "mode": mode,
+            "service_url": node.url,
+            "status_code": r.status_code,
+            "error_message": r.text,
+            "timestamp": int(time())
+        })
+        raise HTTPException(500, r.text)
+
+    return r.json()
+
+
+async def process_upload(
+    principal: dict,
+    file: UploadFile,
+    mode: str,
+    chunked: bool = False,
+    audio_duration: float = None
+):
+    """
+    Run one upload through the result cache / backend, store the
+    transcription record and emit usage logs. Shared by the synchronous
+    /upload path and the async job workers; errors propagate to the caller.
+    With `chunked`, long PCM WAV files are split and sent in parallel.
+    `audio_duration` is probed from the file when not given.
+
+    Returns (result, transcription_record).
+    """
+    user_id = principal["user_id"]
+    username = principal["username"]
+    start_time = time()
+
+    # Identical audio (same mode) is answered from an earlier result
+    content_hash = None
+    if RESULT_CACHE_ENABLED and principal["result_cache"]:
+        content_hash = await hash_upload(file, mode)
+
+    if audio_duration is None:
+        _, audio_duration = await asyncio.to_thread(probe_duration, file.file)
+    # Unknown formats are costed from their size (~128 kbit/s)
+    cost = audio_duration if audio_duration is not None else (file.size or 0) / 16000
+
+    plan = None
+    if chunked:
+        plan = await asyncio.to_thread(plan_chunks, file.file)
+
+    if plan:
+        compute = lambda: process_chunked(
+            file, plan, lambda part, seconds: call_backend(mode, part, user_id, username, seconds)
+        )
+    else:
+        compute = lambda: call_backend(mode, file, user_id, username, cost)
+
+    async def compute_and_store():
+        result = await compute()
+        # Inline when small, otherwise a reference to a compressed blob
+        return result, await store_result(result, f"{file.filename or 'audio'}.json")
+
+    try:
+        if content_hash:
+            # Cache hits reuse the stored result of the earlier record
+            (result, stored), result_source = await get_or_compute(
+                user_id, content_hash, compute_and_store
+            )
+        else:
+            result, stored = await compute_and_store()
+            result_source = "backend"
+    except BackendOverloaded:
+        raise  # shed before any processing; the upload is refunded
+    except Exception:
+        await record_usage(
+            user_id, mode,
+            processing_sec=time() - start_time,
+            size=file.size,
+            failed=True
+        )
+        raise
+
+    processing_sec = time() - start_time
+    duration = int(processing_sec)
+
+    # Audio duration from the container headers when possible, otherwise
+    # estimated from the end of the last segment
+    if audio_duration is None:
+        audio_duration = 0
+        if result and isinstance(result, dict) and "segments" in result:
+            segments = result["segments"]
+            if segments and isinstance(segments, list):
+                # Find the maximum end time among all segments
+                max_end_time = 0
+                for segment in segments:
+                    if isinstance(segment, dict):
+                        end_time = segment.get("end", 0)
+                        if isinstance(end_time, (int, float)):
+                            max_end_time = max(max_end_time, end_time)
+                audio_duration = int(max_end_time)
+
+    # Store the transcription/diarization result in MongoDB
+    transcription_record = {
+        "user_id": user_id,
+        "username": username,
+        "filename": file.filename,
+        "mode": mode,
+        **stored,
+        "created_at": datetime.utcnow(),
+        "processing_duration_sec": duration,  # Duration for processing
+        "audio_duration_sec": audio_duration,  # Actual audio duration
+        "file_size": file.size,
+        "result_source": result_source,
+        "version": 1  # ETag of GET /transcription/{id}; bump on any change
+    }
+    if content_hash:
+        transcription_record["content_hash"] = content_hash
+    if plan:
+        transcription_record["chunks"] = len(plan["chunks"])
+    
+    # Insert the record into the transcriptions collection
+    try:
+        await async_transcriptions_collection.insert_one(transcription_record)
+    except Exception:
+        await discard_result(stored)  # no orphaned blob
+        raise
+
+    await record_usage(
+        user_id, mode,
+        audio_sec=audio_duration,
+        processing_sec=processing_sec,
+        size=file.size
+    )
+
+    # -------------------------
+    # 🧾 LOG EVENT
+    # -------------------------
+    log_event("logs_usage", {
+        "event": "file_uploaded_success",
+        "user_id": user_id,
+        "username": username,
+        "filename": file.filename,
+        "mode": mode,
+        "duration_sec": duration,
+        "result_size": len(str(result)),
+        "result_source": result_source,
+        "timestamp": int(time())
+    })
+
+    log_event("logs_api", {
+        "event": "upload_completed",
+        "user_id": user_id,
+        "username": username,
+        "filename": file.filename,
+        "mode": mode,
+        "processing_time": duration,
+        "timestamp": int(time())
+    })
+
+    return result, transcription_record
+
 
 @app.post("/upload")
 async def upload_audio(
     request: Request,
+    response: Response,
     file: UploadFile = File(...),
     mode: str = Query(..., enum=["transcribe", "diarize"]),
-    user_id: str = Depends(get_user_id)
+    run_async: bool = Query(False, alias="async"),
+    chunked: bool = Query(False),
+    principal: dict = Depends(get_principal)
 ):
+    user_id = principal["user_id"]
+    username = principal["username"]
+
     log_event("logs_api", {
         "event": "upload_request_received",
         "user_id": user_id,
@@ -121,34 +423,16 @@ async def upload_audio(
         "timestamp": int(time())
     })
 
-    # -------------------------
-    # 🔐 USER AUTH CHECK
-    # -------------------------
-    if not user_id:
-        log_event("logs_api", {
-            "event": "upload_unauthorized",
-            "reason": "not_logged_in",
-            "filename": file.filename,
-            "mode": mode,
-            "timestamp": int(time())
-        })
-        raise HTTPException(401, "Login required")
-
-    from auth.mongo import ObjectId
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        log_event("logs_api", {
-            "event": "upload_user_not_found",
-            "user_id": user_id,
-            "filename": file.filename,
-            "mode": mode,
-            "timestamp": int(time())
-        })
-        raise HTTPException(404, "User not found")
+    # Speaker labels are assigned per request, so they would not line up
+    # across chunks
+    if chunked and mode != "transcribe":
+        raise HTTPException(400, "Chunked processing is only available for transcribe mode")
 
     # -------------------------
     # 🔑 API KEY VALIDATION  ✅ NEW
     # -------------------------
+    # The principal already carries the user's key hash and status, so no
+    # further user / API key lookups are needed here.
     api_key = request.headers.get("x-api-key")
     if not api_key:
         log_event("logs_api", {
@@ -161,8 +445,7 @@ async def upload_audio(
         })
         raise HTTPException(403, "API key required")
 
-    api_key_doc = api_keys_collection.find_one({"user_id": user_id})
-    if not api_key_doc:
+    if not principal["api_key_hash"]:
         log_event("logs_api", {
             "event": "upload_blocked",
             "reason": "api_key_not_found",
@@ -173,7 +456,7 @@ async def upload_audio(
         })
         raise HTTPException(403, "Invalid API key")
 
-    if not api_key_doc.get("active", False):
+    if not principal["api_key_active"]:
         log_event("logs_api", {
             "event": "upload_blocked",
             "reason": "api_key_inactive",
@@ -184,7 +467,7 @@ async def upload_audio(
         })
         raise HTTPException(403, "API key inactive")
 
-    if not verify_api_key(api_key, api_key_doc["key_hash"]):
+    if not verify_api_key(api_key, principal["api_key_hash"]):
         log_event("logs_api", {
             "event": "upload_blocked",
             "reason": "api_key_mismatch",
@@ -195,167 +478,167 @@ async def upload_audio(
         })
         raise HTTPException(403, "Invalid API key")
 
+    # -------------------------
+    # ⏱️ AUDIO DURATION LIMIT
+    # -------------------------
+    # Header-only probe: rejects over-long files before they use quota or
+    # reach the backend (unknown formats are let through)
+    audio_format, audio_duration = await asyncio.to_thread(probe_duration, file.file)
+    max_duration = max_audio_duration(principal)
+    if max_duration and audio_duration and audio_duration > max_duration:
+        log_event("logs_api", {
+            "event": "upload_blocked",
+            "reason": "audio_too_long",
+            "user_id": user_id,
+            "filename": file.filename,
+            "mode": mode,
+            "audio_format": audio_format,
+            "audio_duration": audio_duration,
+            "max_duration": max_duration,
+            "timestamp": int(time())
+        })
+        raise HTTPException(
+            413,
+            f"Audio is {audio_duration:.0f}s long; the limit is {max_duration:.0f}s"
+        )
+
     # update last-used timestamp
-    api_keys_collection.update_one(
-        {"_id": api_key_doc["_id"]},
+    await async_api_keys_collection.update_one(
+        {"_id": principal["api_key_id"]},
         {"$set": {"last_used_at": int(time())}}
     )
 
     # -------------------------
     # 🚫 UPLOAD LIMIT CHECK
     # -------------------------
-    hourly_key = f"upload_limit:{user_id}"
-
-    current_count = int(redis_client.get(hourly_key) or 0)
-
+    # Reserve a slot in the sliding window up front (atomic, one round trip)
+    reservation = await reserve_upload(user_id, principal["upload_limit"])
 
     log_event("logs_usage", {
         "event": "hourly_upload_quota_check",
         "user_id": user_id,
-        "username": user["username"],
-        "current_count": current_count,
-        "hourly_limit": user["upload_limit"],
+        "username": username,
+        "current_count": reservation["count"],
+        "hourly_limit": principal["upload_limit"],
         "timestamp": int(time())
     })
 
-    if current_count >= user["upload_limit"]:
+    if not reservation["allowed"]:
         log_event("logs_usage", {
             "event": "upload_blocked",
-            "user_id": str(user["_id"]),
-            "username": user["username"],
-            "files_uploaded": current_count,
-            "upload_limit": user["upload_limit"],
+            "user_id": user_id,
+            "username": username,
+            "files_uploaded": reservation["count"],
+            "upload_limit": principal["upload_limit"],
             "reason": "upload_limit_exceeded",
             "filename": file.filename,
             "mode": mode,
             "timestamp": int(time())
         })
-        raise HTTPException(403, "Upload limit exceeded")
+        raise HTTPException(
+            403,
+            "Upload limit exceeded",
+            headers={
+                **quota_headers(reservation),
+                "Retry-After": str(reservation["reset_sec"])
+            }
+        )
     
     # -------------------------
-    # 🎧 CALL INTERNAL SERVICES
+    # ⏳ ASYNC JOB MODE
     # -------------------------
-    headers = {"x-api-key": API_KEY}
-    start_time = time()
+    if run_async:
+        job = await submit_job(principal, file, mode, reservation, chunked=chunked)
+        response.status_code = 202
+        response.headers.update(quota_headers(reservation))
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "status_url": f"/jobs/{job['job_id']}"
+        }
 
+    # -------------------------
+    # 🎧 CALL INTERNAL SERVICES
+    # -------------------------
     try:
-        async with httpx.AsyncClient(timeout=None) as client:
-            file_content = await file.read()
-            files = {"file": (file.filename, file_content)}
-
-            log_event("logs_api", {
-                "event": "calling_internal_service",
-                "user_id": str(user["_id"]),
-                "username": user["username"],
-                "filename": file.filename,
-                "mode": mode,
-                "service_url": TRANSCRIBE_API if mode == "transcribe" else DIARIZE_API,
-                "timestamp": int(time())
-            })
-
-            if mode == "transcribe":
-                r = await client.post(TRANSCRIBE_API, files=files, headers=headers)
-            if mode == "diarize":
-                r = await client.post(DIARIZE_API, files=files, headers=headers)
+        result, _ = await process_upload(
+            principal, file, mode, chunked=chunked, audio_duration=audio_duration
+        )
 
-        if r.status_code != 200:
-            log_event("logs_api", {
-                "event": "internal_service_error",
-                "user_id": str(user["_id"]),
-                "username": user["username"],
-                "filename": file.filename,
-                "mode": mode,
-                "status_code": r.status_code,
-                "error_message": r.text,
-                "timestamp": int(time())
-            })
-            raise HTTPException(500, r.text)
+        response.headers.update(quota_headers(reservation))
+        return result
 
-        result = r.json()
-        duration = int(time() - start_time)
 
-        # Calculate audio duration from result if available
-        audio_duration = 0
-        if result and isinstance(result, dict) and "segments" in result:
-            segments = result["segments"]
-            if segments and isinstance(segments, list):
-                # Find the maximum end time among all segments
-                max_end_time = 0
-                for segment in segments:
-                    if isinstance(segment, dict):
-                        end_time = segment.get("end", 0)
-                        if isinstance(end_time, (int, float)):
-                            max_end_time = max(max_end_time, end_time)
-                audio_duration = int(max_end_time)
-
-        # Store the transcription/diarization result in MongoDB
-        transcription_record = {
-            "user_id": str(user["_id"]),
-            "username": user["username"],
-            "filename": file.filename,
-            "mode": mode,
-            "result": result,
-            "created_at": datetime.utcnow(),
-            "processing_duration_sec": duration,  # Duration for processing
-            "audio_duration_sec": audio_duration,  # Actual audio duration
-            "file_size": file.size
-        }
-        
-        # Insert the record into the transcriptions collection
-        transcriptions_collection.insert_one(transcription_record)
-
-        # -------------------------
-        # 📊 UPDATE HOURLY UPLOAD LIMIT
-        # -------------------------
-        hourly_key = f"upload_limit:{user_id}"
-
-        pipe = redis_client.pipeline()
-        pipe.incr(hourly_key)
-        pipe.expire(hourly_key, 3600)
-        pipe.execute()
-
-        # OPTIONAL analytics
-        stats_key = f"stats:{user_id}"
-        redis_client.hincrby(stats_key, "seconds_processed", duration)
-
-        # -------------------------
-        # 🧾 LOG EVENT
-        # -------------------------
-        log_event("logs_usage", {
-            "event": "file_uploaded_success",
-            "user_id": user["_id"],
-            "username": user["username"],
-            "filename": file.filename,
-            "mode": mode,
-            "duration_sec": duration,
-            "result_size": len(str(result)),
-            "timestamp": int(time())
-        })
+    except BackendOverloaded as e:
+        # Shed load instead of queueing unboundedly on the GPU service
+        await refund_upload(user_id, reservation)
 
         log_event("logs_api", {
-            "event": "upload_completed",
-            "user_id": str(user["_id"]),
-            "username": user["username"],
+            "event": "upload_rejected_backend_busy",
+            "user_id": user_id,
+            "username": username,
             "filename": file.filename,
             "mode": mode,
-            "processing_time": duration,
+            "reason": e.reason,
+            "retry_after": e.retry_after,
             "timestamp": int(time())
         })
-
-        return result
-
+        raise HTTPException(
+            429,
+            "Backend busy, please retry later",
+            headers={
+                **quota_headers(reservation),
+                "Retry-After": str(e.retry_after)
+            }
+        )
 
     except Exception as e:
+        # The upload did not go through: give the quota slot back
+        await refund_upload(user_id, reservation)
+
         log_event("logs_api", {
             "event": "upload_processing_error",
-            "user_id": str(user["_id"]),
-            "username": user["username"],
+            "user_id": user_id,
+            "username": username,
             "filename": file.filename,
             "mode": mode,
             "error": str(e),
             "timestamp": int(time())
         })
         raise HTTPException(500, f"Processing error: {str(e)}")
+
+
+# -------------------------
+# UPLOAD JOB STATUS
+# -------------------------
+@app.get("/jobs/{job_id}")
+async def get_upload_job(job_id: str, user_id: str = Depends(get_user_id)):
+    job = await get_job(job_id)
+    if not job or job.get("user_id") != user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    payload = {
+        "job_id": job_id,
+        "status": job["status"],
+        "filename": job.get("filename"),
+        "mode": job.get("mode"),
+        "created_at": int(job["created_at"]),
+        "started_at": int(job["started_at"]) if job.get("started_at") else None,
+        "finished_at": int(job["finished_at"]) if job.get("finished_at") else None
+    }
+
+    if job["status"] == "failed":
+        payload["error"] = job.get("error")
+
+    if job["status"] == "done":
+        record = await async_transcriptions_collection.find_one({
+            "_id": ObjectId(job["transcription_id"]),
+            "user_id": user_id
+        }, RESULT_FIELDS)
+        payload["transcription_id"] = job["transcription_id"]
+        payload["result"] = await load_result(record) if record else None
+
+    return payload
 # -------------------------
 # LIVE WEBSOCKET BRIDGE
 # -------------------------
@@ -391,46 +674,35 @@ async def websocket_diarize(
         "timestamp": int(time())
     })
 
-    backend_ws_url = (
-        f"{DIARIZE_API.replace('http', 'ws')}/ws/diarize"
-        f"?api_key={API_KEY}"
-    )
-
+    diarize_pool = backend_pools["diarize"]
+    node = diarize_pool.pick()
+    backend_ws_url = diarize_ws_url(node.url)
+    backend_connected = False
 
     try:
-        async with websockets.connect(backend_ws_url, max_size=None) as backend_ws:
-            log_event("logs_api", {
-                "event": "backend_websocket_connected",
-                "backend_url": backend_ws_url,
-                "timestamp": int(time())
-            })
-            
-            while True:
-                # 1️⃣ Receive audio from browser
-                data = await ws.receive_bytes()
-                
+        async with diarize_pool.session(node):
+            # Pre-opened socket when the node's pool has one
+            backend_ws, prewarmed = await acquire_backend_ws(backend_ws_url)
+            async with backend_ws:
+                backend_connected = True
+                diarize_pool.mark_success(node)
                 log_event("logs_api", {
-                    "event": "audio_data_received",
-                    "data_size": len(data),
+                    "event": "backend_websocket_connected",
+                    "backend_url": backend_ws_url,
+                    "prewarmed": prewarmed,
                     "timestamp": int(time())
                 })
 
-                # 2️⃣ Send audio to WhisperX
-                await backend_ws.send(data)
-
-                # 3️⃣ Receive JSON result from WhisperX
-                result = await backend_ws.recv()   # JSON string
+                # Browser -> backend and backend -> browser run independently
+                reason, relay_stats = await relay(ws, backend_ws)
 
-                # 4️⃣ Forward JSON to browser (IMPORTANT)
-                await ws.send_json(
-                    json.loads(result)
-                )
-                
-                log_event("logs_api", {
-                    "event": "result_forwarded_to_client",
-                    "result_size": len(result),
-                    "timestamp": int(time())
-                })
+        log_event("logs_api", {
+            "event": "websocket_disconnected",
+            "client_host": ws.client.host,
+            "reason": reason,
+            **relay_stats,
+            "timestamp": int(time())
+        })
 
     except WebSocketDisconnect:
         log_event("logs_api", {
@@ -442,6 +714,8 @@ async def websocket_diarize(
         print("Browser disconnected")
 
     except Exception as e:
+        if not backend_connected:
+            diarize_pool.mark_failure(node, e)
         log_event("logs_api", {
             "event": "websocket_error",
             "client_host": ws.client.host,
@@ -463,13 +737,80 @@ from app_logger.logger import start_request, end_request  # ✅ ADD THIS
 # -------------------------
 # FETCH USER HISTORY
 # -------------------------
+# created_at is stored as naive UTC
+EPOCH = datetime(1970, 1, 1)
+# Upper bound for timestamp filters, so date arithmetic stays in range
+MAX_TIMESTAMP = 4102444800  # 2100-01-01
+
+HISTORY_FIELDS = {
+    "filename": 1,
+    "mode": 1,
+    "created_at": 1,
+    "processing_duration_sec": 1,
+    "audio_duration_sec": 1,
+    "file_size": 1
+}
+
+
+def _encode_history_cursor(record: dict) -> str:
+    created_ms = (record["created_at"] - EPOCH) // timedelta(milliseconds=1)
+    raw = f"{created_ms}:{record['_id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_history_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_ms, record_id = raw.split(":", 1)
+        return EPOCH + timedelta(milliseconds=int(created_ms)), ObjectId(record_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
 @app.get("/history")
-async def get_user_history(user_id: str = Depends(get_user_id)):
-    # Find all successful transcription/diarization records for this user
-    history_records = transcriptions_collection.find({
-        "user_id": user_id
-    }).sort("created_at", -1).limit(50)  # Last 50 entries, newest first
-    
+async def get_user_history(
+    page_size: int = Query(50, ge=1, le=200),
+    cursor: str = Query(None),
+    mode: str = Query(None, enum=["transcribe", "diarize"]),
+    date_from: int = Query(None, ge=0, le=MAX_TIMESTAMP, description="Unix timestamp, inclusive"),
+    date_to: int = Query(None, ge=0, le=MAX_TIMESTAMP, description="Unix timestamp, exclusive"),
+    filename_prefix: str = Query(None),
+    user_id: str = Depends(get_user_id)
+):
+    # Newest first, keyset-paginated on (created_at, _id) so every page is an
+    # index range scan no matter how deep; a filename prefix is checked on the
+    # index keys (filename is the last key), and `result` is never loaded here
+    query = {"user_id": user_id}
+    if mode:
+        query["mode"] = mode
+    if filename_prefix:
+        query["filename"] = {"$regex": f"^{re.escape(filename_prefix)}"}
+    if date_from is not None or date_to is not None:
+        query["created_at"] = {}
+        if date_from is not None:
+            query["created_at"]["$gte"] = EPOCH + timedelta(seconds=date_from)
+        if date_to is not None:
+            query["created_at"]["$lt"] = EPOCH + timedelta(seconds=date_to)
+
+    if cursor:
+        created_at, record_id = _decode_history_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": record_id}}
+        ]}]}
+
+    history_records = await async_transcriptions_collection.find_list(
+        query,
+        HISTORY_FIELDS,
+        sort=[("created_at", -1), ("_id", -1)],
+        limit=page_size + 1
+    )
+
+    next_cursor = None
+    if len(history_records) > page_size:
+        history_records = history_records[:page_size]
+        next_cursor = _encode_history_cursor(history_records[-1])
+
     history = []
     for record in history_records:
         history.append({
@@ -481,40 +822,51 @@ async def get_user_history(user_id: str = Depends(get_user_id)):
             "audio_duration": record.get("audio_duration_sec"),
             "size": record.get("file_size")
         })
-    
-    return history
+
+    return {"items": history, "next_cursor": next_cursor}
 
 # -------------------------
 # FETCH TRANSCRIPTION RESULT
 # -------------------------
 @app.get("/transcription/{transcription_id}")
-async def get_transcription_result(transcription_id: str, user_id: str = Depends(get_user_id)):
-    from auth.mongo import ObjectId
+async def get_transcription_result(
+    transcription_id: str,
+    if_none_match: str = Header(None),
+    accept_encoding: str = Header(None),
+    user_id: str = Depends(get_user_id)
+):
     try:
         # Convert string ID to ObjectId
         obj_id = ObjectId(transcription_id)
-        
-        # Find the transcription record for this user
-        record = transcriptions_collection.find_one({
-            "_id": obj_id,
-            "user_id": user_id
-        })
-        
-        if not record:
-            raise HTTPException(status_code=404, detail="Transcription not found")
-        
-        # Return the result data
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid transcription ID")
+
+    # Ownership + version only; the result itself is loaded only if the
+    # client (or the compressed response cache) doesn't already have it
+    meta = await async_transcriptions_collection.find_one(
+        {"_id": obj_id, "user_id": user_id},
+        {"version": 1}
+    )
+    if not meta:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+
+    etag = make_etag(obj_id, meta.get("version", 1))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    async def payload():
+        record = await async_transcriptions_collection.find_one({"_id": obj_id})
         return {
             "id": str(record["_id"]),
             "filename": record.get("filename"),
             "mode": record.get("mode"),
-            "result": record.get("result"),
+            "result": await load_result(record),
             "created_at": record["created_at"],
             "processing_duration": record.get("processing_duration_sec"),
             "audio_duration": record.get("audio_duration_sec")
         }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail="Invalid transcription ID")
+
+    return await versioned_json(payload, etag, accept_encoding)
 
 @app.middleware("http")
 async def audit_middleware(request: Request, call_next):
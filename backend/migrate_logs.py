@@ -0,0 +1,126 @@
+"""
+Copy gateway events from the plain App.log collection to app_events.
+
+Old documents ({collection, data, timestamp: epoch seconds}) are rewritten
+in the time-series shape the sink now writes ({timestamp: datetime,
+meta: {collection, event}, data}) and inserted in batches, in _id order.
+Progress is checkpointed after every batch, so an interrupted run picks
+up where it stopped. Events already past their category's retention are
+skipped unless --keep-expired is given (the TTL would delete them anyway).
+
+Usage (from backend/):
+    python migrate_logs.py --dry-run
+    python migrate_logs.py --batch-size 5000
+    python migrate_logs.py --drop-source     # drop App.log once copied
+"""
+import argparse
+from datetime import datetime
+
+from auth.mongo import (
+    DAY_SEC,
+    LOG_RETENTION_DAYS,
+    LOG_RETENTION_DEFAULT_DAYS,
+    app_log_collection,
+    db,
+    ensure_collection,
+    events_collection
+)
+
+CHECKPOINT_ID = "app_log_to_app_events"
+checkpoints = db["migrations"]
+
+
+def _to_event(doc: dict) -> dict:
+    data = doc.get("data") or {}
+    ts = doc.get("timestamp")
+    if isinstance(ts, (int, float)):
+        ts = datetime.utcfromtimestamp(ts)
+    elif not isinstance(ts, datetime):
+        ts = doc["_id"].generation_time.replace(tzinfo=None)
+    return {
+        "timestamp": ts,
+        "meta": {"collection": doc.get("collection"), "event": data.get("event")},
+        "data": data
+    }
+
+
+def _expired(event: dict, now: datetime) -> bool:
+    days = min(
+        LOG_RETENTION_DAYS.get(event["meta"]["collection"], LOG_RETENTION_DEFAULT_DAYS),
+        LOG_RETENTION_DEFAULT_DAYS
+    )
+    return (now - event["timestamp"]).total_seconds() > days * DAY_SEC
+
+
+def migrate(batch_size: int, dry_run: bool, keep_expired: bool, drop_source: bool):
+    if not dry_run:
+        ensure_collection(events_collection.name)
+
+    checkpoint = checkpoints.find_one({"_id": CHECKPOINT_ID}) or {}
+    query = {}
+    if checkpoint.get("last_id") is not None:
+        query["_id"] = {"$gt": checkpoint["last_id"]}
+        print(f"Resuming after {checkpoint['last_id']}")
+
+    scanned = copied = expired = 0
+    now = datetime.utcnow()
+    last_id = None
+
+    cursor = app_log_collection.find(query, sort=[("_id", 1)], batch_size=batch_size)
+    try:
+        batch = []
+        for doc in cursor:
+            scanned += 1
+            last_id = doc["_id"]
+            event = _to_event(doc)
+            if not keep_expired and _expired(event, now):
+                expired += 1
+            else:
+                batch.append(event)
+
+            if scanned % batch_size == 0:
+                copied += _flush(batch, last_id, dry_run)
+                batch = []
+                print(f"... {scanned} scanned, {copied} copied")
+        copied += _flush(batch, last_id, dry_run)
+    finally:
+        cursor.close()
+
+    print("\n=== App.log migration ===")
+    print(f"Mode:           {'dry run' if dry_run else 'applied'}")
+    print(f"Events scanned: {scanned}")
+    print(f"Copied:         {copied}")
+    print(f"Skipped:        {expired} (past retention)")
+
+    if drop_source and not dry_run:
+        app_log_collection.drop()
+        checkpoints.delete_one({"_id": CHECKPOINT_ID})
+        print("Dropped App.log")
+
+
+def _flush(batch: list, last_id, dry_run: bool) -> int:
+    if dry_run or last_id is None:
+        return len(batch)
+    if batch:
+        events_collection.insert_many(batch, ordered=False)
+    # A crash between the insert and the checkpoint re-copies one batch
+    checkpoints.update_one(
+        {"_id": CHECKPOINT_ID},
+        {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return len(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--keep-expired", action="store_true")
+    parser.add_argument("--drop-source", action="store_true")
+    args = parser.parse_args()
+    migrate(args.batch_size, args.dry_run, args.keep_expired, args.drop_source)
+
+
+if __name__ == "__main__":
+    main()
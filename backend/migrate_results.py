@@ -0,0 +1,94 @@
+"""
+Move large inline transcription results to compressed GridFS blobs.
+
+Records whose `result` encodes to more than RESULT_INLINE_MAX_BYTES get the
+same treatment as new uploads (see gateway/result_store.py): the result is
+compressed into the "results" bucket and replaced by result_ref. Safe to
+re-run; records that already have a result_ref are skipped.
+
+Usage (from backend/):
+    python migrate_results.py --dry-run
+    python migrate_results.py --batch-size 200
+"""
+import argparse
+
+from auth.mongo import transcriptions_collection
+from gateway.result_store import (
+    RESULT_INLINE_MAX_BYTES,
+    compress,
+    delete_blob,
+    encode_result,
+    put_blob
+)
+
+
+def _size(n: int) -> str:
+    if n < 1024 * 1024:
+        return f"{n / 1024:.1f} KB"
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def migrate(batch_size: int, dry_run: bool, threshold: int):
+    scanned = moved = 0
+    before = after = 0
+    encoding, _ = compress(b"")
+
+    cursor = transcriptions_collection.find(
+        {"result": {"$exists": True}, "result_ref": {"$exists": False}},
+        {"result": 1, "filename": 1, "version": 1},
+        batch_size=batch_size,
+        no_cursor_timeout=True
+    )
+    try:
+        for record in cursor:
+            scanned += 1
+            raw = encode_result(record["result"])
+            if len(raw) <= threshold:
+                continue
+
+            if dry_run:
+                stored = len(compress(raw)[1])
+            else:
+                fields = put_blob(raw, f"{record.get('filename') or 'audio'}.json")
+                res = transcriptions_collection.update_one(
+                    {"_id": record["_id"], "result_ref": {"$exists": False}},
+                    # New ETag for GET /transcription/{id} (records without
+                    # a version were served as v1)
+                    {"$set": {**fields, "version": record.get("version", 1) + 1},
+                     "$unset": {"result": ""}}
+                )
+                if not res.modified_count:
+                    # Changed under us; leave the record as it is
+                    delete_blob(fields["result_ref"])
+                    continue
+                stored = fields["result_stored_size"]
+
+            moved += 1
+            before += len(raw)
+            after += stored
+            if moved % batch_size == 0:
+                print(f"... {moved} moved ({scanned} scanned)")
+    finally:
+        cursor.close()
+
+    saved = before - after
+    print("\n=== Result storage migration ===")
+    print(f"Mode:            {'dry run' if dry_run else 'applied'} ({encoding})")
+    print(f"Records scanned: {scanned}")
+    print(f"Records moved:   {moved} (threshold {threshold} bytes)")
+    print(f"Inline size:     {_size(before)}")
+    print(f"Stored size:     {_size(after)}")
+    print(f"Saved:           {_size(saved)}" + (f" ({saved / before:.0%})" if before else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--threshold", type=int, default=RESULT_INLINE_MAX_BYTES)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    migrate(args.batch_size, args.dry_run, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,10 @@ def test_history_endpoint():
         print(f"History endpoint status: {response.status_code}")
         if response.status_code == 200:
             data = response.json()
-            print(f"History data: {len(data)} records returned")
-            if data:
-                print(f"First record: {data[0]}")
+            items = data["items"]
+            print(f"History data: {len(items)} records returned, next_cursor: {data['next_cursor']}")
+            if items:
+                print(f"First record: {items[0]}")
         else:
             print(f"Error: {response.text}")
     except Exception as e:
@@ -67,9 +67,19 @@ export async function uploadAudio(file, mode) {
   }
 }
 
-export async function fetchHistory() {
+// Returns { items, next_cursor }; pass next_cursor back as `cursor` for the next page
+export async function fetchHistory({ cursor, pageSize, mode, dateFrom, dateTo, filenamePrefix } = {}) {
+  const params = new URLSearchParams();
+  if (cursor) params.set("cursor", cursor);
+  if (pageSize) params.set("page_size", pageSize);
+  if (mode) params.set("mode", mode);
+  if (dateFrom) params.set("date_from", dateFrom);
+  if (dateTo) params.set("date_to", dateTo);
+  if (filenamePrefix) params.set("filename_prefix", filenamePrefix);
+  const query = params.toString();
+
   try {
-    const response = await fetch(`${API_BASE}/history`, {
+    const response = await fetch(`${API_BASE}/history${query ? `?${query}` : ""}`, {
       credentials: "include"
     });
 
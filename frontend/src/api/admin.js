@@ -1,14 +1,27 @@
 const API_BASE = "/api";
 /**
- * Fetch all users with their details including API key status and upload limits
+ * Fetch one page of users with their details including API key status and
+ * upload limits. Returns { items, total, page, page_size }.
  */
-export async function fetchUsers() {
+export async function fetchUsers({ page = 1, pageSize = 50, sort = "username", order = "asc", search = "" } = {}) {
   console.log("FRONTEND LOG: Fetching users for admin panel", {
+    page,
+    sort,
+    order,
+    search,
     timestamp: new Date().toISOString()
   });
-  
+
+  const params = new URLSearchParams({
+    page: String(page),
+    page_size: String(pageSize),
+    sort,
+    order
+  });
+  if (search) params.set("search", search);
+
   try {
-    const response = await fetch(`${API_BASE}/admin/users`, {
+    const response = await fetch(`${API_BASE}/admin/users?${params}`, {
       credentials: "include"
     });
 
@@ -16,14 +29,15 @@ export async function fetchUsers() {
       throw new Error(`Failed to fetch users: ${response.status} ${response.statusText}`);
     }
 
-    const users = await response.json();
+    const data = await response.json();
     
     console.log("FRONTEND LOG: Successfully fetched users", {
-      count: users.length,
+      count: data.items.length,
+      total: data.total,
       timestamp: new Date().toISOString()
     });
     
-    return users;
+    return data;
   } catch (error) {
     console.error("FRONTEND LOG: Error fetching users", {
       error: error.message,
@@ -115,7 +129,8 @@ export async function updateUploadLimit(userId, newLimit) {
 }
 
 /**
- * Delete a user and all related data (API keys, usage, logs)
+ * Delete a user and all related data (API keys, transcriptions, usage, logs).
+ * The purge runs in the background; the result carries job_id / status_url.
  */
 export async function deleteUser(userId) {
   console.log("FRONTEND LOG: Deleting user", {
@@ -136,8 +151,9 @@ export async function deleteUser(userId) {
 
     const result = await response.json();
 
-    console.log("FRONTEND LOG: User deleted successfully", {
+    console.log("FRONTEND LOG: User deletion started", {
       userId,
+      jobId: result.job_id,
       timestamp: new Date().toISOString()
     });
 
@@ -3,7 +3,9 @@ import { fetchHistory, fetchTranscriptionResult } from "../api";
 
 export default function History({ onResultClick }) {
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
 
   useEffect(() => {
@@ -11,7 +13,8 @@ export default function History({ onResultClick }) {
       try {
         setLoading(true);
         const data = await fetchHistory();
-        setHistory(data);
+        setHistory(data.items);
+        setNextCursor(data.next_cursor);
       } catch (err) {
         setError("Failed to load history");
         console.error("Error loading history:", err);
@@ -43,6 +46,19 @@ export default function History({ onResultClick }) {
     return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
   };
 
+  const handleLoadMore = async () => {
+    try {
+      setLoadingMore(true);
+      const data = await fetchHistory({ cursor: nextCursor });
+      setHistory((prev) => [...prev, ...data.items]);
+      setNextCursor(data.next_cursor);
+    } catch (err) {
+      console.error("Error loading more history:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleViewResult = async (item) => {
     // Load the result and pass it to the parent component to display in the main output
     try {
@@ -105,6 +121,17 @@ export default function History({ onResultClick }) {
           </div>
         ))}
       </div>
+      {nextCursor && (
+        <div className="button-row">
+          <button
+            className="view-result-btn"
+            onClick={handleLoadMore}
+            disabled={loadingMore}
+          >
+            {loadingMore ? "Loading..." : "Load More"}
+          </button>
+        </div>
+      )}
     </div>
   );
 }
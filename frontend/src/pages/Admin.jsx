@@ -3,19 +3,29 @@ import { useNavigate } from "react-router-dom";
 
 import { fetchUsers, toggleApiKey, updateUploadLimit, deleteUser } from "../api/admin";
 
+const PAGE_SIZE = 50;
+
 export default function Admin() {
   const navigate = useNavigate();
   const [users, setUsers] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [query, setQuery] = useState({ page: 1, sort: "username", order: "asc", search: "" });
+  const [searchInput, setSearchInput] = useState("");
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [editingUserId, setEditingUserId] = useState(null); // Track which user is being edited
   const [changedLimits, setChangedLimits] = useState({}); // Track changed limits
 
+  const loadUsers = async (q = query) => {
+    const data = await fetchUsers({ ...q, pageSize: PAGE_SIZE });
+    setUsers(data.items);
+    setTotal(data.total);
+  };
+
   useEffect(() => {
-    const loadUsers = async () => {
+    const load = async () => {
       try {
-        const userData = await fetchUsers();
-        setUsers(userData);
+        await loadUsers(query);
         setError(null);
       } catch (err) {
         console.error("Error fetching users:", err);
@@ -25,8 +35,34 @@ export default function Admin() {
       }
     };
 
-    loadUsers();
-  }, []);
+    load();
+  }, [query]);
+
+  // Debounced search; results restart at the first page
+  useEffect(() => {
+    const timer = setTimeout(() => {
+      setQuery(prev =>
+        prev.search === searchInput.trim()
+          ? prev
+          : { ...prev, page: 1, search: searchInput.trim() }
+      );
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchInput]);
+
+  const handleSort = (field) => {
+    setQuery(prev => ({
+      ...prev,
+      page: 1,
+      sort: field,
+      order: prev.sort === field && prev.order === "asc" ? "desc" : "asc"
+    }));
+  };
+
+  const sortLabel = (field, label) =>
+    query.sort === field ? `${label} ${query.order === "asc" ? "▲" : "▼"}` : label;
+
+  const totalPages = Math.max(1, Math.ceil(total / PAGE_SIZE));
 
   const handleApiKeyToggle = async (userId, currentStatus) => {
     try {
@@ -96,8 +132,7 @@ export default function Admin() {
     setChangedLimits({});
     
     // Refresh the user data to reflect the changes
-    const userData = await fetchUsers();
-    setUsers(userData);
+    await loadUsers();
     
     alert('All changes saved successfully!');
   };
@@ -113,8 +148,9 @@ export default function Admin() {
 
       // Remove from UI immediately
       setUsers(prev => prev.filter(u => u.id !== userId));
+      setTotal(prev => prev - 1);
 
-      alert(`User "${username}" deleted successfully`);
+      alert(`User "${username}" is being deleted; their data is removed in the background`);
     } catch (err) {
       console.error("Error deleting user:", err);
       alert(`Failed to delete user: ${err.message}`);
@@ -162,15 +198,32 @@ export default function Admin() {
         </button>
       </div>
 
+      <div className="admin-filters">
+        <input
+          type="search"
+          placeholder="Search username or email"
+          value={searchInput}
+          onChange={(e) => setSearchInput(e.target.value)}
+          className="admin-search"
+        />
+        <span className="admin-total">{total} users</span>
+      </div>
+
       {/* ===== USERS TABLE ===== */}
       <div className="admin-table-container">
         <table className="admin-table">
           <thead>
             <tr>
-              <th>Username</th>
-              <th>Email</th>
+              <th className="sortable" onClick={() => handleSort("username")}>
+                {sortLabel("username", "Username")}
+              </th>
+              <th className="sortable" onClick={() => handleSort("email")}>
+                {sortLabel("email", "Email")}
+              </th>
               <th>User Type</th>
-              <th>Upload Limit</th>
+              <th className="sortable" onClick={() => handleSort("upload_limit")}>
+                {sortLabel("upload_limit", "Upload Limit")}
+              </th>
               <th>API Key Status</th>
               <th>Actions</th>
             </tr>
@@ -233,6 +286,23 @@ export default function Admin() {
           </tbody>
         </table>
       </div>
+
+      {/* ===== PAGINATION ===== */}
+      <div className="admin-pagination">
+        <button
+          disabled={query.page <= 1}
+          onClick={() => setQuery(prev => ({ ...prev, page: prev.page - 1 }))}
+        >
+          ← Prev
+        </button>
+        <span>Page {query.page} of {totalPages}</span>
+        <button
+          disabled={query.page >= totalPages}
+          onClick={() => setQuery(prev => ({ ...prev, page: prev.page + 1 }))}
+        >
+          Next →
+        </button>
+      </div>
     </div>
   </div>
 );